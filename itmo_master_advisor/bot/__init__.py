@@ -1,5 +1,5 @@
-from .telegram_bot import create_bot, run_bot
-from .states import DialogState, UserProfile
-from .handlers import get_user_profile
-
+from .telegram_bot import create_bot, run_bot
+from .states import DialogState, UserProfile
+from .handlers import get_user_profile
+
 __all__ = ["create_bot", "run_bot", "DialogState", "UserProfile", "get_user_profile"]
\ No newline at end of file
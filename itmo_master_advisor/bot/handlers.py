@@ -1,232 +1,416 @@
-"""
-Обработчики команд и сообщений Telegram-бота
-"""
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
-from telegram.ext import (
-    ContextTypes,
-    CommandHandler,
-    MessageHandler,
-    ConversationHandler,
-    filters
-)
-import logging
-
-from bot.states import DialogState, UserProfile
-from rag.retriever import RAGRetriever
-from prompts.system_prompts import ONBOARDING_PROMPT
-
-logger = logging.getLogger(__name__)
-
-# Глобальное хранилище профилей пользователей
-user_profiles: dict[int, UserProfile] = {}
-
-# Инициализация RAG
-rag = RAGRetriever()
-
-
-def get_user_profile(user_id: int) -> UserProfile:
-    """Получение или создание профиля пользователя"""
-    if user_id not in user_profiles:
-        user_profiles[user_id] = UserProfile(user_id=user_id)
-    return user_profiles[user_id]
-
-
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка команды /start"""
-    user_id = update.effective_user.id
-    profile = get_user_profile(user_id)
-    profile.state = DialogState.START
-    
-    await update.message.reply_text(
-        ONBOARDING_PROMPT,
-        reply_markup=ReplyKeyboardMarkup(
-            [
-                ["🎓 Сравнить программы"],
-                ["📚 Помощь с выбором курсов"],
-                ["❓ Задать вопрос"]
-            ],
-            resize_keyboard=True
-        )
-    )
-
-
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка команды /help"""
-    help_text = """
-🤖 **Команды бота:**
-
-/start - Начать диалог
-/compare - Сравнить программы AI и AI Product
-/recommend - Получить рекомендации по курсам
-/profile - Показать/обновить профиль
-/reset - Сбросить профиль
-/help - Показать эту справку
-
-💡 **Примеры вопросов:**
-- Какие курсы есть на программе AI?
-- Чем отличается AI от AI Product?
-- Какие выборные курсы взять, если интересует NLP?
-- Какой бэкграунд нужен для поступления?
-    """
-    await update.message.reply_text(help_text, parse_mode='Markdown')
-
-
-async def compare_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Сравнение программ"""
-    await update.message.reply_text("🔄 Анализирую программы...")
-    
-    try:
-        comparison = rag.compare_programs()
-        await update.message.reply_text(comparison)
-    except Exception as e:
-        logger.error(f"Error comparing programs: {e}")
-        await update.message.reply_text(
-            "Произошла ошибка при сравнении программ. Попробуйте позже."
-        )
-
-
-async def recommend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Рекомендации по курсам"""
-    user_id = update.effective_user.id
-    profile = get_user_profile(user_id)
-    
-    if not profile.is_profile_complete():
-        profile.state = DialogState.COLLECTING_BACKGROUND
-        await update.message.reply_text(
-            "Чтобы дать персональные рекомендации, мне нужно узнать о тебе больше.\n\n"
-            "Расскажи о своём бэкграунде (образование, опыт работы с программированием/ML):",
-            reply_markup=ReplyKeyboardRemove()
-        )
-        return
-    
-    await update.message.reply_text("🔄 Подбираю курсы...")
-    
-    try:
-        recommendations = rag.get_course_recommendations(
-            user_background=profile.background,
-            interests=profile.interests or ["машинное обучение"]
-        )
-        await update.message.reply_text(recommendations)
-    except Exception as e:
-        logger.error(f"Error getting recommendations: {e}")
-        await update.message.reply_text(
-            "Произошла ошибка при подборе рекомендаций. Попробуйте позже."
-        )
-
-
-async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Показать профиль пользователя"""
-    user_id = update.effective_user.id
-    profile = get_user_profile(user_id)
-    
-    profile_text = f"""
-👤 **Твой профиль:**
-
-📚 Бэкграунд: {profile.background or 'Не указан'}
-🎯 Интересы: {', '.join(profile.interests) if profile.interests else 'Не указаны'}
-💼 Опыт: {profile.experience or 'Не указан'}
-🎓 Предпочитаемая программа: {profile.preferred_program or 'Не выбрана'}
-
-Чтобы обновить профиль, используй /reset и начни заново.
-    """
-    await update.message.reply_text(profile_text, parse_mode='Markdown')
-
-
-async def reset_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Сброс профиля"""
-    user_id = update.effective_user.id
-    user_profiles[user_id] = UserProfile(user_id=user_id)
-    
-    await update.message.reply_text(
-        "✅ Профиль сброшен. Используй /start чтобы начать заново."
-    )
-
-
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка текстовых сообщений"""
-    user_id = update.effective_user.id
-    profile = get_user_profile(user_id)
-    message_text = update.message.text
-    
-    # Обработка кнопок меню
-    if message_text == "🎓 Сравнить программы":
-        return await compare_command(update, context)
-    elif message_text == "📚 Помощь с выбором курсов":
-        return await recommend_command(update, context)
-    elif message_text == "❓ Задать вопрос":
-        await update.message.reply_text(
-            "Задай свой вопрос о программах AI или AI Product:",
-            reply_markup=ReplyKeyboardRemove()
-        )
-        return
-    
-    # Обработка состояний сбора информации
-    if profile.state == DialogState.COLLECTING_BACKGROUND:
-        profile.background = message_text
-        profile.state = DialogState.COLLECTING_INTERESTS
-        
-        await update.message.reply_text(
-            "Отлично! Теперь расскажи, что тебя интересует в AI?\n"
-            "(например: компьютерное зрение, NLP, reinforcement learning, MLOps)",
-            reply_markup=ReplyKeyboardMarkup(
-                [
-                    ["Computer Vision", "NLP"],
-                    ["Deep Learning", "MLOps"],
-                    ["Reinforcement Learning", "Generative AI"],
-                    ["Пропустить"]
-                ],
-                resize_keyboard=True
-            )
-        )
-        return
-    
-    elif profile.state == DialogState.COLLECTING_INTERESTS:
-        if message_text != "Пропустить":
-            profile.interests = [i.strip() for i in message_text.replace(",", " ").split()]
-        profile.state = DialogState.READY
-        
-        await update.message.reply_text(
-            "Спасибо! Теперь я могу давать персональные рекомендации.\n\n"
-            "Задай вопрос о программах или используй кнопки меню:",
-            reply_markup=ReplyKeyboardMarkup(
-                [
-                    ["🎓 Сравнить программы"],
-                    ["📚 Помощь с выбором курсов"],
-                    ["❓ Задать вопрос"]
-                ],
-                resize_keyboard=True
-            )
-        )
-        return
-    
-    # Обычный вопрос — обрабатываем через RAG
-    await update.message.reply_text("🔄 Думаю над ответом...")
-    
-    try:
-        answer = rag.get_answer(
-            query=message_text,
-            user_context=profile.to_context(),
-            check_relevance=True
-        )
-        await update.message.reply_text(answer)
-        
-        # Сохраняем в историю
-        profile.conversation_history.append({
-            "role": "user",
-            "content": message_text
-        })
-        profile.conversation_history.append({
-            "role": "assistant", 
-            "content": answer
-        })
-        
-    except Exception as e:
-        logger.error(f"Error processing message: {e}")
-        await update.message.reply_text(
-            "Произошла ошибка при обработке вопроса. Попробуйте переформулировать."
-        )
-
-
-async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработка ошибок"""
+"""
+Обработчики команд и сообщений Telegram-бота
+"""
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, AsyncIterator, Optional, Tuple
+
+import numpy as np
+from cachetools import TTLCache
+from telegram import Message, Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram.ext import (
+    ContextTypes,
+    CommandHandler,
+    MessageHandler,
+    ConversationHandler,
+    filters
+)
+import logging
+
+from bot.states import DialogState, UserProfile
+from prompts.system_prompts import (
+    ONBOARDING_PROMPT,
+    EMPTY_ANSWER_MESSAGE,
+    IRRELEVANT_QUESTION_MESSAGE
+)
+
+if TYPE_CHECKING:
+    from rag.retriever import RAGRetriever
+
+logger = logging.getLogger(__name__)
+
+# Глобальное хранилище профилей пользователей: неактивные профили
+# вытесняются через час, общее число ограничено
+user_profiles: TTLCache[int, UserProfile] = TTLCache(maxsize=10_000, ttl=3600)
+
+# Клавиатуры неизменяемы — создаём один раз при импорте
+MAIN_MENU = ReplyKeyboardMarkup(
+    [
+        ["🎓 Сравнить программы"],
+        ["📚 Помощь с выбором курсов"],
+        ["❓ Задать вопрос"]
+    ],
+    resize_keyboard=True
+)
+
+INTERESTS_MENU = ReplyKeyboardMarkup(
+    [
+        ["Computer Vision", "NLP"],
+        ["Deep Learning", "MLOps"],
+        ["Reinforcement Learning", "Generative AI"],
+        ["Пропустить"]
+    ],
+    resize_keyboard=True
+)
+
+# Интересы разделяются запятыми, многословные ("Computer Vision") не дробятся
+_INTEREST_SPLIT_RE = re.compile(r'\s*,\s*')
+
+PROFILE_TEMPLATE = """
+👤 **Твой профиль:**
+
+📚 Бэкграунд: {background}
+🎯 Интересы: {interests}
+💼 Опыт: {experience}
+🎓 Предпочитаемая программа: {preferred_program}
+
+Чтобы обновить профиль, используй /reset и начни заново.
+    """
+
+# RAG создаётся при первом обращении: импорт модуля не поднимает
+# векторное хранилище и клиентов OpenAI
+_rag: Optional["RAGRetriever"] = None
+_rag_lock = threading.Lock()
+
+
+def _get_rag() -> "RAGRetriever":
+    """Единственный экземпляр RAG-системы"""
+    global _rag
+    
+    # Обработчики вызывают RAG из разных потоков — создаём его ровно один раз
+    with _rag_lock:
+        if _rag is None:
+            from rag.retriever import RAGRetriever
+            _rag = RAGRetriever()
+        return _rag
+
+
+# Порог косинусной близости, при котором вопрос считается повтором
+SEMANTIC_CACHE_THRESHOLD = 0.95
+
+# Ответы на точные повторы: (нормализованный вопрос, профиль и история) -> ответ
+ANSWER_CACHE_SIZE = 1024
+_answer_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+
+# Недавние ответы для поиска похожих вопросов: (ctx_key, эмбеддинг, ответ)
+_semantic_cache: deque = deque(maxlen=256)
+
+
+def _embed_query(query_norm: str) -> np.ndarray:
+    """Нормированный эмбеддинг вопроса"""
+    query_embedding = np.asarray(_get_rag().vector_store.embed_query(query_norm))
+    return query_embedding / np.linalg.norm(query_embedding)
+
+
+def _has_similar_candidates(ctx_key: str) -> bool:
+    """Есть ли недавние ответы с тем же профилем, с которыми стоит сравнивать вопрос"""
+    return any(key == ctx_key for key, _, _ in _semantic_cache)
+
+
+def _find_similar_answer(query_embedding: np.ndarray, ctx_key: str) -> Optional[str]:
+    """Ответ на самый похожий из недавних вопросов с тем же профилем"""
+    candidates = [(emb, answer) for key, emb, answer in _semantic_cache if key == ctx_key]
+    if not candidates:
+        return None
+    
+    similarities = np.stack([emb for emb, _ in candidates]) @ query_embedding
+    best = int(np.argmax(similarities))
+    if similarities[best] > SEMANTIC_CACHE_THRESHOLD:
+        return candidates[best][1]
+    return None
+
+
+def _remember_answer(cache_key: Tuple[str, str], query_embedding: np.ndarray, answer: str):
+    """Сохранение ответа в кэши точных и похожих вопросов"""
+    _answer_cache[cache_key] = answer
+    if len(_answer_cache) > ANSWER_CACHE_SIZE:
+        _answer_cache.popitem(last=False)
+    _semantic_cache.append((cache_key[1], query_embedding, answer))
+
+
+# Как часто обновлять сообщение при потоковой генерации ответа (секунды);
+# Telegram допускает около одного редактирования в секунду на чат
+STREAM_EDIT_INTERVAL = 1.0
+
+# Максимальная длина текста одного сообщения Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+async def _show_answer(message: Message, text: str, shown: str = "") -> None:
+    """Ответ в сообщение-заглушку; не уместившееся в лимит уходит следующими сообщениями"""
+    head = text[:TELEGRAM_MESSAGE_LIMIT]
+    if head != shown:
+        await message.edit_text(head)
+    for start in range(TELEGRAM_MESSAGE_LIMIT, len(text), TELEGRAM_MESSAGE_LIMIT):
+        await message.reply_text(text[start:start + TELEGRAM_MESSAGE_LIMIT])
+
+
+async def _stream_to_message(message: Message, chunks: AsyncIterator[str]) -> str:
+    """Вывод ответа по мере генерации через редактирование сообщения"""
+    text = ""
+    shown = ""
+    last_edit = time.monotonic()
+    async for chunk in chunks:
+        text += chunk
+        # Пока идёт генерация, показывается только то, что влезает в одно сообщение
+        head = text[:TELEGRAM_MESSAGE_LIMIT]
+        if head != shown and head.strip() and time.monotonic() - last_edit >= STREAM_EDIT_INTERVAL:
+            await message.edit_text(head)
+            shown = head
+            last_edit = time.monotonic()
+    
+    # Пустой текст Telegram не примет — заглушку заменит вызывающий
+    if text.strip():
+        await _show_answer(message, text, shown)
+    return text
+
+
+async def _answer_question(question: str, profile: UserProfile, message: Message) -> str:
+    """Ответ на вопрос пользователя в сообщение-заглушку с кэшированием повторов"""
+    user_context = profile.to_context()
+    history = list(profile.conversation_history)
+    query_norm = question.strip().lower()
+    ctx_key = json.dumps(user_context, sort_keys=True, ensure_ascii=False)
+    if history:
+        # Ответ зависит и от предыдущих сообщений, поэтому они входят в ключ кэша
+        history_json = json.dumps(history, sort_keys=True, ensure_ascii=False)
+        ctx_key += "|" + hashlib.blake2b(history_json.encode("utf-8"), digest_size=16).hexdigest()
+    cache_key = (query_norm, ctx_key)
+    
+    answer = _answer_cache.get(cache_key)
+    if answer is not None:
+        _answer_cache.move_to_end(cache_key)
+        await _show_answer(message, answer)
+        return answer
+    
+    # Эмбеддинг вопроса запрашивается, только если есть с чем сравнивать
+    query_embedding = None
+    if _has_similar_candidates(ctx_key):
+        query_embedding = await asyncio.to_thread(_embed_query, query_norm)
+        answer = _find_similar_answer(query_embedding, ctx_key)
+        if answer is not None:
+            await _show_answer(message, answer)
+            return answer
+    
+    # Проверка релевантности и поиск по программам идут внутри одновременно
+    chunks = _get_rag().stream_answer(
+        query=question,
+        user_context=user_context,
+        check_relevance=True,
+        history=history
+    )
+    
+    # Ошибки генерации пробрасываются из генератора и не попадают в кэш
+    answer = await _stream_to_message(message, chunks)
+    if not answer.strip():
+        await message.edit_text(EMPTY_ANSWER_MESSAGE)
+        return ""
+    
+    # Отказ по релевантности не кэшируется: ошибочный отказ не должен
+    # повторяться для всех похожих вопросов
+    if answer != IRRELEVANT_QUESTION_MESSAGE:
+        if query_embedding is None:
+            # Поиск уже получил эмбеддинг этого вопроса, так что он берётся из кэша
+            query_embedding = await asyncio.to_thread(_embed_query, query_norm)
+        _remember_answer(cache_key, query_embedding, answer)
+    return answer
+
+
+async def warmup(application):
+    """Прогрев RAG до начала приёма обновлений"""
+    try:
+        # Создание RAG загружает индекс и курсы, поэтому выполняется в потоке
+        rag = await asyncio.to_thread(_get_rag)
+        await rag.warmup()
+        logger.info("RAG warmed up")
+    except Exception as e:
+        logger.error(f"Error warming up RAG: {e}")
+
+
+def get_user_profile(user_id: int) -> UserProfile:
+    """Получение или создание профиля пользователя"""
+    profile = user_profiles.get(user_id)
+    if profile is None:
+        profile = UserProfile(user_id=user_id)
+    # Повторная запись продлевает TTL активного пользователя
+    user_profiles[user_id] = profile
+    return profile
+
+
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработка команды /start"""
+    user_id = update.effective_user.id
+    profile = get_user_profile(user_id)
+    profile.state = DialogState.START
+    
+    await update.message.reply_text(
+        ONBOARDING_PROMPT,
+        reply_markup=MAIN_MENU
+    )
+
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработка команды /help"""
+    help_text = """
+🤖 **Команды бота:**
+
+/start - Начать диалог
+/compare - Сравнить программы AI и AI Product
+/recommend - Получить рекомендации по курсам
+/profile - Показать/обновить профиль
+/reset - Сбросить профиль
+/help - Показать эту справку
+
+💡 **Примеры вопросов:**
+- Какие курсы есть на программе AI?
+- Чем отличается AI от AI Product?
+- Какие выборные курсы взять, если интересует NLP?
+- Какой бэкграунд нужен для поступления?
+    """
+    await update.message.reply_text(help_text, parse_mode='Markdown')
+
+
+async def compare_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Сравнение программ"""
+    await update.message.reply_text("🔄 Анализирую программы...")
+    
+    try:
+        comparison = await _get_rag().compare_programs()
+        await update.message.reply_text(comparison)
+    except Exception as e:
+        logger.error(f"Error comparing programs: {e}")
+        await update.message.reply_text(
+            "Произошла ошибка при сравнении программ. Попробуйте позже."
+        )
+
+
+async def recommend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Рекомендации по курсам"""
+    user_id = update.effective_user.id
+    profile = get_user_profile(user_id)
+    
+    if not profile.is_profile_complete():
+        profile.state = DialogState.COLLECTING_BACKGROUND
+        await update.message.reply_text(
+            "Чтобы дать персональные рекомендации, мне нужно узнать о тебе больше.\n\n"
+            "Расскажи о своём бэкграунде (образование, опыт работы с программированием/ML):",
+            reply_markup=ReplyKeyboardRemove()
+        )
+        return
+    
+    await update.message.reply_text("🔄 Подбираю курсы...")
+    
+    try:
+        recommendations = await _get_rag().get_course_recommendations(
+            user_background=profile.background,
+            interests=profile.interests or ["машинное обучение"]
+        )
+        await update.message.reply_text(recommendations)
+    except Exception as e:
+        logger.error(f"Error getting recommendations: {e}")
+        await update.message.reply_text(
+            "Произошла ошибка при подборе рекомендаций. Попробуйте позже."
+        )
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показать профиль пользователя"""
+    user_id = update.effective_user.id
+    profile = get_user_profile(user_id)
+    
+    profile_text = PROFILE_TEMPLATE.format_map({
+        "background": profile.background or 'Не указан',
+        "interests": ', '.join(profile.interests) if profile.interests else 'Не указаны',
+        "experience": profile.experience or 'Не указан',
+        "preferred_program": profile.preferred_program or 'Не выбрана'
+    })
+    await update.message.reply_text(profile_text, parse_mode='Markdown')
+
+
+async def reset_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Сброс профиля"""
+    user_id = update.effective_user.id
+    user_profiles[user_id] = UserProfile(user_id=user_id)
+    
+    await update.message.reply_text(
+        "✅ Профиль сброшен. Используй /start чтобы начать заново."
+    )
+
+
+async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработка текстовых сообщений"""
+    user_id = update.effective_user.id
+    profile = get_user_profile(user_id)
+    message_text = update.message.text
+    
+    # Обработка кнопок меню
+    if message_text == "🎓 Сравнить программы":
+        return await compare_command(update, context)
+    elif message_text == "📚 Помощь с выбором курсов":
+        return await recommend_command(update, context)
+    elif message_text == "❓ Задать вопрос":
+        await update.message.reply_text(
+            "Задай свой вопрос о программах AI или AI Product:",
+            reply_markup=ReplyKeyboardRemove()
+        )
+        return
+    
+    # Обработка состояний сбора информации
+    if profile.state == DialogState.COLLECTING_BACKGROUND:
+        profile.background = message_text
+        profile.state = DialogState.COLLECTING_INTERESTS
+        
+        await update.message.reply_text(
+            "Отлично! Теперь расскажи, что тебя интересует в AI?\n"
+            "(например: компьютерное зрение, NLP, reinforcement learning, MLOps)",
+            reply_markup=INTERESTS_MENU
+        )
+        return
+    
+    elif profile.state == DialogState.COLLECTING_INTERESTS:
+        if message_text != "Пропустить":
+            profile.interests = [
+                i.strip() for i in _INTEREST_SPLIT_RE.split(message_text) if i.strip()
+            ]
+        profile.state = DialogState.READY
+        
+        await update.message.reply_text(
+            "Спасибо! Теперь я могу давать персональные рекомендации.\n\n"
+            "Задай вопрос о программах или используй кнопки меню:",
+            reply_markup=MAIN_MENU
+        )
+        return
+    
+    # Обычный вопрос — обрабатываем через RAG
+    placeholder = await update.message.reply_text("🔄 Думаю над ответом...")
+    
+    try:
+        answer = await _answer_question(message_text, profile, placeholder)
+        if not answer:
+            return
+        
+        # Сохраняем в историю (deque с maxlen сам отбрасывает старые сообщения)
+        profile.conversation_history.append({
+            "role": "user",
+            "content": message_text
+        })
+        profile.conversation_history.append({
+            "role": "assistant", 
+            "content": answer
+        })
+        
+    except Exception as e:
+        logger.error(f"Error processing message: {e}")
+        await update.message.reply_text(
+            "Произошла ошибка при обработке вопроса. Попробуйте переформулировать."
+        )
+
+
+async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработка ошибок"""
     logger.error(f"Update {update} caused error {context.error}")
\ No newline at end of file
@@ -1,30 +1,64 @@
-import os
-from dotenv import load_dotenv
-from pydantic import BaseSettings
-
-load_dotenv()
-
-class Settings(BaseSettings):
-    # API Keys
-    TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
-    OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
-    
-    # URLs
-    AI_PROGRAM_URL: str = "https://abit.itmo.ru/program/master/ai"
-    AI_PRODUCT_URL: str = "https://abit.itmo.ru/program/master/ai_product"
-    
-    # Model settings
-    EMBEDDING_MODEL: str = "text-embedding-3-small"
-    LLM_MODEL: str = "gpt-4-turbo-preview"
-    TEMPERATURE: float = 0.3
-    
-    # RAG settings
-    CHUNK_SIZE: int = 500
-    CHUNK_OVERLAP: int = 50
-    TOP_K_RESULTS: int = 5
-    
-    # Paths
-    DATA_DIR: str = "data"
-    CHROMA_DIR: str = "chroma_db"
-
-settings = Settings()
\ No newline at end of file
+from functools import lru_cache
+from typing import Dict
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    # Значения читаются из окружения и .env один раз при создании
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+        frozen=True
+    )
+    
+    # API Keys
+    TELEGRAM_BOT_TOKEN: str = ""
+    OPENAI_API_KEY: str = ""
+    
+    # URLs
+    AI_PROGRAM_URL: str = "https://abit.itmo.ru/program/master/ai"
+    AI_PRODUCT_URL: str = "https://abit.itmo.ru/program/master/ai_product"
+    
+    # Файлы с данными программ в DATA_DIR: идентификатор программы -> имя файла
+    PROGRAM_FILES: Dict[str, str] = {
+        "ai": "ai_program.json",
+        "ai_product": "ai_product_program.json"
+    }
+    
+    # Model settings
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    # Укороченные эмбеддинги text-embedding-3: 512 вместо 1536 измерений
+    EMBEDDING_DIMENSIONS: int = 512
+    # "openai" или "onnx" — локальная модель E5 из LOCAL_EMBEDDING_MODEL_DIR
+    # (после смены бэкенда нужна переиндексация: python main.py index)
+    EMBEDDING_BACKEND: str = "openai"
+    LOCAL_EMBEDDING_MODEL_DIR: str = "models/multilingual-e5-small"
+    LLM_MODEL: str = "gpt-4-turbo-preview"
+    TEMPERATURE: float = 0.3
+    # Сколько запросов к LLM API (включая потоковые) выполняется одновременно на процесс
+    LLM_MAX_CONCURRENCY: int = 8
+    
+    # RAG settings
+    CHUNK_SIZE: int = 500
+    CHUNK_OVERLAP: int = 50
+    TOP_K_RESULTS: int = 5
+    
+    # Scraper settings
+    CHROMEDRIVER_PATH: str = ""
+    
+    # Paths
+    DATA_DIR: str = "data"
+    INDEX_DIR: str = "vector_index"
+    # Дисковый кэш ответов LLM внутри DATA_DIR (очищается при индексации)
+    LLM_CACHE_DIRNAME: str = "llm_cache"
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    """Настройки приложения (создаются один раз на процесс)"""
+    return Settings()
+
+
+settings = get_settings()
@@ -1,62 +1,78 @@
-"""
-Главный файл запуска приложения
-"""
-import argparse
-import logging
-
-from config import settings
-
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
-logger = logging.getLogger(__name__)
-
-
-def parse_data():
-    """Парсинг данных с сайтов"""
-    from parser.scraper import main as parse_main
-    parse_main()
-
-
-def index_data():
-    """Индексация данных в векторное хранилище"""
-    from rag.vector_store import VectorStore
-    
-    store = VectorStore()
-    store.clear()
-    store.load_and_index_programs()
-    logger.info("Data indexed successfully!")
-
-
-def run_bot():
-    """Запуск Telegram-бота"""
-    from bot.telegram_bot import run_bot as start_bot
-    start_bot()
-
-
-def main():
-    parser = argparse.ArgumentParser(description="ITMO Master Advisor Bot")
-    parser.add_argument(
-        "command",
-        choices=["parse", "index", "run", "all"],
-        help="Command to execute"
-    )
-    
-    args = parser.parse_args()
-    
-    if args.command == "parse":
-        parse_data()
-    elif args.command == "index":
-        index_data()
-    elif args.command == "run":
-        run_bot()
-    elif args.command == "all":
-        logger.info("Running full pipeline...")
-        parse_data()
-        index_data()
-        run_bot()
-
-
-if __name__ == "__main__":
+"""
+Главный файл запуска приложения
+"""
+import argparse
+import logging
+import os
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def setup_logging():
+    """Единая настройка логирования для всех модулей"""
+    if not logging.getLogger().handlers:
+        logging.basicConfig(
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            level=logging.INFO
+        )
+    
+    # httpx пишет INFO на каждый запрос к Telegram и OpenAI
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("telegram").setLevel(logging.INFO)
+
+
+def parse_data():
+    """Парсинг данных с сайтов"""
+    from parser.scraper import main as parse_main
+    parse_main()
+
+
+def index_data():
+    """Индексация данных в векторное хранилище"""
+    from diskcache import Cache
+    from rag.vector_store import VectorStore
+    
+    store = VectorStore()
+    store.clear()
+    store.load_and_index_programs()
+    
+    # Закэшированные ответы LLM построены по старому индексу
+    with Cache(os.path.join(settings.DATA_DIR, settings.LLM_CACHE_DIRNAME)) as cache:
+        cache.clear()
+    logger.info("Data indexed successfully!")
+
+
+def run_bot():
+    """Запуск Telegram-бота"""
+    from bot.telegram_bot import run_bot as start_bot
+    start_bot()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ITMO Master Advisor Bot")
+    parser.add_argument(
+        "command",
+        choices=["parse", "index", "run", "all"],
+        help="Command to execute"
+    )
+    
+    args = parser.parse_args()
+    setup_logging()
+    
+    if args.command == "parse":
+        parse_data()
+    elif args.command == "index":
+        index_data()
+    elif args.command == "run":
+        run_bot()
+    elif args.command == "all":
+        logger.info("Running full pipeline...")
+        parse_data()
+        index_data()
+        run_bot()
+
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
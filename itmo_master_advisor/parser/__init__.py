@@ -1,3 +1,3 @@
-from .scraper import ITMOScraper, Program, Course
-
+from .scraper import ITMOScraper, Program, Course
+
 __all__ = ["ITMOScraper", "Program", "Course"]
\ No newline at end of file
@@ -1,13 +1,37 @@
-from .system_prompts import (
-    SYSTEM_PROMPT,
-    RELEVANCE_CHECK_PROMPT,
-    RECOMMENDATION_PROMPT,
-    ONBOARDING_PROMPT
-)
-
-__all__ = [
-    "SYSTEM_PROMPT",
-    "RELEVANCE_CHECK_PROMPT", 
-    "RECOMMENDATION_PROMPT",
-    "ONBOARDING_PROMPT"
+from .system_prompts import (
+    SYSTEM_PROMPT,
+    RELEVANCE_CHECK_PROMPT,
+    RECOMMENDATION_PROMPT,
+    ONBOARDING_PROMPT,
+    ANSWER_ERROR_MESSAGE,
+    ANSWER_PROMPT,
+    ENRICHMENT_PROMPT,
+    COMPARISON_CONTEXT_TEMPLATE,
+    COMPARISON_PROMPT,
+    ADMISSION_PROMPT,
+    FALLBACK_COMPARISON,
+    IRRELEVANT_QUESTION_MESSAGE,
+    RECOMMENDATIONS_ERROR_MESSAGE,
+    ADMISSION_ERROR_MESSAGE,
+    EMPTY_ANSWER_MESSAGE,
+    PROMPT_VERSION
+)
+
+__all__ = [
+    "SYSTEM_PROMPT",
+    "RELEVANCE_CHECK_PROMPT", 
+    "RECOMMENDATION_PROMPT",
+    "ONBOARDING_PROMPT",
+    "ANSWER_ERROR_MESSAGE",
+    "ANSWER_PROMPT",
+    "ENRICHMENT_PROMPT",
+    "COMPARISON_CONTEXT_TEMPLATE",
+    "COMPARISON_PROMPT",
+    "ADMISSION_PROMPT",
+    "FALLBACK_COMPARISON",
+    "IRRELEVANT_QUESTION_MESSAGE",
+    "RECOMMENDATIONS_ERROR_MESSAGE",
+    "ADMISSION_ERROR_MESSAGE",
+    "EMPTY_ANSWER_MESSAGE",
+    "PROMPT_VERSION"
 ]
\ No newline at end of file
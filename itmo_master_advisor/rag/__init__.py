@@ -1,4 +1,4 @@
-from .vector_store import VectorStore
-from .retriever import RAGRetriever
-
+from .vector_store import VectorStore
+from .retriever import RAGRetriever
+
 __all__ = ["VectorStore", "RAGRetriever"]
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+Локальные эмбеддинги через ONNX Runtime
+"""
+import os
+from typing import List
+
+import numpy as np
+import onnxruntime as ort
+from tokenizers import Tokenizer
+
+# Максимальная длина входа модели в токенах
+MAX_SEQUENCE_LENGTH = 512
+
+# Сколько текстов прогонять через модель за один вызов
+ONNX_BATCH_SIZE = 32
+
+
+class ONNXEmbeddings:
+    """
+    Эмбеддинги моделью семейства E5 (например, multilingual-e5-small),
+    экспортированной в ONNX и квантованной в INT8
+    
+    Каталог модели содержит model.onnx и tokenizer.json. Интерфейс
+    совместим с OpenAIEmbeddings: embed_documents и embed_query.
+    """
+    
+    def __init__(self, model_dir: str):
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(MAX_SEQUENCE_LENGTH)
+        self.tokenizer.enable_padding()
+        
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, "model.onnx"),
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Эмбеддинги документов (E5 требует префикс passage:)"""
+        return self._embed([f"passage: {text}" for text in texts])
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Эмбеддинги поисковых запросов (E5 требует префикс query:)"""
+        return self._embed([f"query: {text}" for text in texts])
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Эмбеддинг одного поискового запроса"""
+        return self.embed_queries([text])[0]
+    
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Прогон модели пачками с усреднением по токенам и L2-нормировкой"""
+        vectors = []
+        for start in range(0, len(texts), ONNX_BATCH_SIZE):
+            encodings = self.tokenizer.encode_batch(texts[start:start + ONNX_BATCH_SIZE])
+            input_ids = np.asarray([encoding.ids for encoding in encodings], dtype=np.int64)
+            attention_mask = np.asarray(
+                [encoding.attention_mask for encoding in encodings], dtype=np.int64
+            )
+            
+            inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self._input_names:
+                inputs["token_type_ids"] = np.zeros_like(input_ids)
+            
+            # Первый выход — last_hidden_state: (batch, seq_len, dim)
+            hidden = self.session.run(None, inputs)[0]
+            
+            # Усреднение только по настоящим токенам, без паддинга
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.linalg.norm(pooled, axis=1, keepdims=True)
+            vectors.extend(pooled.tolist())
+        
+        return vectors
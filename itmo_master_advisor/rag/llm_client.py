@@ -0,0 +1,165 @@
+"""
+Фасад над AsyncOpenAI с объединением одновременных запросов
+"""
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+# Окно накопления запросов и размер пачки, при котором она уходит сразу
+COALESCE_WINDOW_SECONDS = 0.01
+MAX_BATCH_SIZE = 8
+
+# Ограничения запроса к OpenAI, чтобы зависший ответ не держал обработчик
+LLM_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+LLM_MAX_RETRIES = 2
+
+# (model, temperature, max_tokens)
+Params = Tuple[str, float, int]
+
+
+class LLMClient:
+    """
+    Отправка chat-completion запросов пачками
+    
+    Запросы копятся не дольше COALESCE_WINDOW_SECONDS или до MAX_BATCH_SIZE
+    штук и группируются по параметрам генерации (max_tokens служит корзиной
+    по ожидаемой длине ответа). Одинаковые промпты внутри пачки выполняются
+    один раз, а все группы уходят одновременно через общий пул соединений,
+    но не больше max_concurrency запросов сразу. Потоковые ответы (stream)
+    не объединяются, но делят с ними то же ограничение.
+    """
+    
+    def __init__(self, client: AsyncOpenAI, max_concurrency: Optional[int] = None):
+        self.client = client
+        # Ограничение одновременных запросов, чтобы всплеск не упирался в rate limit
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self._pending: List[Tuple[Params, str, List[Dict], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Ссылки на отправляющие задачи, чтобы их не собрал сборщик мусора
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def submit(
+        self,
+        messages: List[Dict],
+        model: str,
+        temperature: float,
+        max_tokens: int
+    ) -> str:
+        """Постановка запроса в очередь; возвращает текст ответа"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        prompt_key = json.dumps(messages, ensure_ascii=False, sort_keys=True)
+        self._pending.append(((model, temperature, max_tokens), prompt_key, messages, future))
+        
+        if len(self._pending) >= MAX_BATCH_SIZE:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(COALESCE_WINDOW_SECONDS, self._flush)
+        
+        return await future
+    
+    async def stream(
+        self,
+        messages: List[Dict],
+        model: str,
+        temperature: float,
+        max_tokens: int
+    ) -> AsyncIterator[str]:
+        """Потоковый запрос; слот max_concurrency занят, пока ответ не дочитан"""
+        if self._semaphore is None:
+            async for part in self._stream_request(model, messages, temperature, max_tokens):
+                yield part
+            return
+        async with self._semaphore:
+            async for part in self._stream_request(model, messages, temperature, max_tokens):
+                yield part
+    
+    def _flush(self) -> None:
+        """Группировка накопленных запросов и запуск их отправки"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        
+        # params -> prompt_key -> (messages, ожидающие ответа future)
+        groups: Dict[Params, Dict[str, Tuple[List[Dict], List[asyncio.Future]]]] = {}
+        for params, prompt_key, messages, future in batch:
+            groups.setdefault(params, {}).setdefault(prompt_key, (messages, []))[1].append(future)
+        
+        task = asyncio.create_task(self._send(groups))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _send(self, groups: Dict[Params, Dict[str, Tuple[List[Dict], List[asyncio.Future]]]]) -> None:
+        """Одновременная отправка уникальных запросов всех групп"""
+        requests = [
+            (params, messages, futures)
+            for params, prompts in groups.items()
+            for messages, futures in prompts.values()
+        ]
+        results = await asyncio.gather(
+            *(self._create(params, messages) for params, messages, _ in requests),
+            return_exceptions=True
+        )
+        
+        for (_, _, futures), result in zip(requests, results):
+            for future in futures:
+                # Вызывающий мог уже отменить ожидание
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+    
+    async def _create(self, params: Params, messages: List[Dict]) -> str:
+        """Один запрос к chat completions API"""
+        model, temperature, max_tokens = params
+        if self._semaphore is None:
+            return await self._request(model, messages, temperature, max_tokens)
+        async with self._semaphore:
+            return await self._request(model, messages, temperature, max_tokens)
+    
+    async def _request(
+        self,
+        model: str,
+        messages: List[Dict],
+        temperature: float,
+        max_tokens: int
+    ) -> str:
+        """Запрос к API без очереди и ограничений"""
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content or ""
+    
+    async def _stream_request(
+        self,
+        model: str,
+        messages: List[Dict],
+        temperature: float,
+        max_tokens: int
+    ) -> AsyncIterator[str]:
+        """Потоковый запрос к API: фрагменты ответа по мере поступления"""
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
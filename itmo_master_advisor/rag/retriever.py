@@ -1,506 +1,704 @@
-"""
-RAG Retriever с LLM-генерацией ответов и интеграцией рекомендательной системы
-"""
-from typing import List, Dict, Optional, Tuple
-from openai import OpenAI
-import logging
-
-from config import settings
-from rag.vector_store import VectorStore
-from recommender.course_recommender import CourseRecommender
-from prompts.system_prompts import (
-    SYSTEM_PROMPT,
-    RELEVANCE_CHECK_PROMPT,
-    RECOMMENDATION_PROMPT
-)
-
-logger = logging.getLogger(__name__)
-
-
-class RAGRetriever:
-    """RAG-система для ответов на вопросы с рекомендациями курсов"""
-    
-    def __init__(self):
-        self.vector_store = VectorStore()
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.recommender = CourseRecommender()
-        self.conversation_cache: Dict[int, List[Dict]] = {}
-    
-    def check_relevance(self, query: str) -> Tuple[bool, str]:
-        """
-        Проверка релевантности вопроса тематике магистратур ИТМО
-        
-        Args:
-            query: Вопрос пользователя
-            
-        Returns:
-            (is_relevant, rejection_message)
-        """
-        try:
-            response = self.client.chat.completions.create(
-                model=settings.LLM_MODEL,
-                messages=[
-                    {"role": "system", "content": RELEVANCE_CHECK_PROMPT},
-                    {"role": "user", "content": query}
-                ],
-                temperature=0.1,
-                max_tokens=100
-            )
-            
-            answer = response.choices[0].message.content.strip().lower()
-            
-            if "да" in answer or "yes" in answer or "релевант" in answer:
-                return True, ""
-            else:
-                rejection_message = (
-                    "Извините, я могу отвечать только на вопросы о магистерских "
-                    "программах ИТМО по направлениям AI и AI Product.\n\n"
-                    "Примеры вопросов, на которые я могу ответить:\n"
-                    "• Какие курсы есть на программе AI?\n"
-                    "• Чем отличаются программы AI и AI Product?\n"
-                    "• Какие выборные дисциплины лучше взять для NLP?\n"
-                    "• Какие требования для поступления?"
-                )
-                return False, rejection_message
-                
-        except Exception as e:
-            logger.error(f"Error checking relevance: {e}")
-            # В случае ошибки пропускаем проверку
-            return True, ""
-    
-    def get_answer(
-        self,
-        query: str,
-        user_context: Optional[Dict] = None,
-        user_id: Optional[int] = None,
-        check_relevance: bool = True
-    ) -> str:
-        """
-        Получение ответа на вопрос с использованием RAG
-        
-        Args:
-            query: Вопрос пользователя
-            user_context: Контекст пользователя (бэкграунд, интересы)
-            user_id: ID пользователя для кэширования истории
-            check_relevance: Проверять ли релевантность вопроса
-            
-        Returns:
-            Ответ на вопрос
-        """
-        # Проверяем релевантность
-        if check_relevance:
-            is_relevant, rejection_message = self.check_relevance(query)
-            if not is_relevant:
-                return rejection_message
-        
-        # Ищем релевантные документы
-        try:
-            relevant_docs = self.vector_store.search(query)
-        except Exception as e:
-            logger.error(f"Error searching vector store: {e}")
-            relevant_docs = []
-        
-        # Формируем контекст из найденных документов
-        context = self._format_context(relevant_docs)
-        
-        # Добавляем информацию о пользователе
-        user_info = self._format_user_info(user_context)
-        
-        # Получаем историю диалога
-        conversation_history = []
-        if user_id and user_id in self.conversation_cache:
-            conversation_history = self.conversation_cache[user_id][-6:]  # Последние 3 обмена
-        
-        # Формируем сообщения для LLM
-        messages = [
-            {"role": "system", "content": SYSTEM_PROMPT + user_info}
-        ]
-        
-        # Добавляем историю диалога
-        messages.extend(conversation_history)
-        
-        # Добавляем текущий вопрос с контекстом
-        current_message = f"""
-Контекст из базы знаний:
-{context}
-
-Вопрос пользователя: {query}
-
-Ответь на вопрос, используя информацию из контекста. Если информации недостаточно, честно скажи об этом.
-"""
-        messages.append({"role": "user", "content": current_message})
-        
-        # Генерируем ответ
-        try:
-            response = self.client.chat.completions.create(
-                model=settings.LLM_MODEL,
-                messages=messages,
-                temperature=settings.TEMPERATURE,
-                max_tokens=1000
-            )
-            
-            answer = response.choices[0].message.content
-            
-            # Сохраняем в историю
-            if user_id:
-                if user_id not in self.conversation_cache:
-                    self.conversation_cache[user_id] = []
-                self.conversation_cache[user_id].append({"role": "user", "content": query})
-                self.conversation_cache[user_id].append({"role": "assistant", "content": answer})
-                
-                # Ограничиваем размер кэша
-                if len(self.conversation_cache[user_id]) > 20:
-                    self.conversation_cache[user_id] = self.conversation_cache[user_id][-20:]
-            
-            return answer
-            
-        except Exception as e:
-            logger.error(f"Error generating answer: {e}")
-            return "Произошла ошибка при генерации ответа. Пожалуйста, попробуйте ещё раз."
-    
-    def get_course_recommendations(
-        self,
-        user_background: str,
-        interests: List[str],
-        program: Optional[str] = None,
-        use_llm: bool = True
-    ) -> str:
-        """
-        Получение персонализированных рекомендаций по курсам
-        
-        Args:
-            user_background: Описание бэкграунда пользователя
-            interests: Список интересов
-            program: Фильтр по программе (опционально)
-            use_llm: Использовать ли LLM для дополнительной персонализации
-            
-        Returns:
-            Форматированные рекомендации
-        """
-        # Получаем рекомендации через рекомендательную систему
-        recommendations = self.recommender.recommend_courses(
-            user_background=user_background,
-            interests=interests,
-            program=program,
-            max_recommendations=5
-        )
-        
-        if not recommendations:
-            return self._get_fallback_recommendations(interests, program)
-        
-        # Форматируем базовые рекомендации
-        base_recommendations = self.recommender.format_recommendations(
-            recommendations, 
-            include_plan=True
-        )
-        
-        # Опционально обогащаем через LLM
-        if use_llm:
-            try:
-                enriched = self._enrich_recommendations_with_llm(
-                    base_recommendations,
-                    user_background,
-                    interests
-                )
-                return enriched
-            except Exception as e:
-                logger.error(f"Error enriching recommendations: {e}")
-                return base_recommendations
-        
-        return base_recommendations
-    
-    def _enrich_recommendations_with_llm(
-        self,
-        base_recommendations: str,
-        user_background: str,
-        interests: List[str]
-    ) -> str:
-        """Обогащение рекомендаций через LLM"""
-        
-        prompt = f"""
-На основе профиля пользователя и базовых рекомендаций, дай развёрнутый персонализированный совет.
-
-Профиль пользователя:
-- Бэкграунд: {user_background}
-- Интересы: {', '.join(interests)}
-
-Базовые рекомендации системы:
-{base_recommendations}
-
-Дополни рекомендации:
-1. Объясни, почему именно эти курсы подходят данному студенту
-2. Дай советы по подготовке к сложным курсам
-3. Укажи, какие навыки помогут в карьере
-4. Предложи дополнительные ресурсы для самостоятельного изучения (если уместно)
-
-Сохрани структуру и форматирование базовых рекомендаций, дополнив их.
-"""
-        
-        response = self.client.chat.completions.create(
-            model=settings.LLM_MODEL,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.4,
-            max_tokens=1500
-        )
-        
-        return response.choices[0].message.content
-    
-    def _get_fallback_recommendations(
-        self,
-        interests: List[str],
-        program: Optional[str] = None
-    ) -> str:
-        """Запасные рекомендации через поиск в векторной базе"""
-        
-        # Ищем информацию о выборных курсах
-        query = f"выборные курсы элективы {' '.join(interests)}"
-        if program:
-            query += f" программа {program}"
-        
-        try:
-            courses = self.vector_store.search(query, top_k=10)
-            context = self._format_context(courses)
-            
-            prompt = RECOMMENDATION_PROMPT.format(
-                background="Не указан",
-                interests=", ".join(interests) if interests else "Общие",
-                courses_context=context
-            )
-            
-            response = self.client.chat.completions.create(
-                model=settings.LLM_MODEL,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=settings.TEMPERATURE,
-                max_tokens=1500
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            logger.error(f"Error in fallback recommendations: {e}")
-            return (
-                "К сожалению, не удалось получить рекомендации. "
-                "Попробуйте уточнить ваши интересы или задать конкретный вопрос о курсах."
-            )
-    
-    def compare_programs(self) -> str:
-        """
-        Сравнение программ AI и AI Product
-        
-        Returns:
-            Форматированное сравнение программ
-        """
-        try:
-            # Получаем информацию об обеих программах
-            ai_docs = self.vector_store.search(
-                "программа AI машинное обучение курсы",
-                top_k=5
-            )
-            
-            product_docs = self.vector_store.search(
-                "программа AI Product продукт менеджмент",
-                top_k=5
-            )
-            
-            context = f"""
-Информация о программе "AI" (Искусственный интеллект):
-{self._format_context(ai_docs)}
-
----
-
-Информация о программе "AI Product" (AI в продуктовой разработке):
-{self._format_context(product_docs)}
-"""
-            
-            comparison_prompt = """
-На основе предоставленной информации сравни две магистерские программы ИТМО.
-
-Структура ответа:
-1. **Краткое описание каждой программы** (2-3 предложения)
-
-2. **Ключевые различия** (таблица или список):
-   - Фокус обучения
-   - Основные курсы
-   - Целевая аудитория
-   - Карьерные траектории
-
-3. **Кому подходит программа "AI":**
-   - Профиль идеального кандидата
-   - Необходимый бэкграунд
-
-4. **Кому подходит программа "AI Product":**
-   - Профиль идеального кандидата
-   - Необходимый бэкграунд
-
-5. **Рекомендация:** как выбрать между программами
-
-Используй эмодзи для наглядности.
-"""
-            
-            response = self.client.chat.completions.create(
-                model=settings.LLM_MODEL,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": f"{context}\n\n{comparison_prompt}"}
-                ],
-                temperature=settings.TEMPERATURE,
-                max_tokens=1500
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            logger.error(f"Error comparing programs: {e}")
-            return self._get_fallback_comparison()
-    
-    def _get_fallback_comparison(self) -> str:
-        """Запасное сравнение программ"""
-        return """
-🎓 **Сравнение магистерских программ ИТМО**
-
-**AI (Искусственный интеллект)**
-• Фокус: глубокое погружение в ML/DL, исследования
-• Для кого: разработчики, исследователи, будущие ML-инженеры
-• Ключевые курсы: Deep Learning, Computer Vision, NLP, RL
-
-**AI Product (AI в продуктовой разработке)**
-• Фокус: применение AI в продуктах, менеджмент AI-проектов
-• Для кого: продакт-менеджеры, предприниматели, техлиды
-• Ключевые курсы: Управление AI-продуктом, Дизайн AI-систем, ML + бизнес
-
-**Как выбрать:**
-→ Хотите строить модели и проводить исследования? → **AI**
-→ Хотите создавать продукты на основе AI и управлять командами? → **AI Product**
-
-Для более детальной информации задайте конкретный вопрос!
-"""
-    
-    def get_admission_info(self, program: Optional[str] = None) -> str:
-        """
-        Получение информации о поступлении
-        
-        Args:
-            program: Название программы (опционально)
-            
-        Returns:
-            Информация о поступлении
-        """
-        query = "требования поступление документы экзамены"
-        if program:
-            query += f" {program}"
-        
-        try:
-            docs = self.vector_store.search(query, top_k=5)
-            context = self._format_context(docs)
-            
-            prompt = f"""
-На основе контекста расскажи о требованиях для поступления на магистерские программы.
-
-Контекст:
-{context}
-
-Структура ответа:
-1. Общие требования
-2. Необходимые документы
-3. Вступительные испытания (если есть)
-4. Сроки подачи документов
-5. Полезные ссылки
-
-Если какой-то информации нет в контексте, укажи это и дай общие рекомендации.
-"""
-            
-            response = self.client.chat.completions.create(
-                model=settings.LLM_MODEL,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=settings.TEMPERATURE,
-                max_tokens=1000
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            logger.error(f"Error getting admission info: {e}")
-            return (
-                "Для получения актуальной информации о поступлении рекомендую "
-                "посетить официальные страницы программ:\n\n"
-                "• AI: https://abit.itmo.ru/program/master/ai\n"
-                "• AI Product: https://abit.itmo.ru/program/master/ai_product"
-            )
-    
-    def clear_user_history(self, user_id: int) -> None:
-        """Очистка истории диалога пользователя"""
-        if user_id in self.conversation_cache:
-            del self.conversation_cache[user_id]
-    
-    def _format_context(self, documents: List[Dict]) -> str:
-        """
-        Форматирование контекста из найденных документов
-        
-        Args:
-            documents: Список документов из векторного хранилища
-            
-        Returns:
-            Отформатированный контекст
-        """
-        if not documents:
-            return "Релевантная информация не найдена в базе знаний."
-        
-        context_parts = []
-        for i, doc in enumerate(documents, 1):
-            content = doc.get('content', '')
-            metadata = doc.get('metadata', {})
-            
-            source_info = ""
-            if metadata.get('program'):
-                source_info = f"[Программа: {metadata['program']}]"
-            if metadata.get('course'):
-                source_info += f" [Курс: {metadata['course']}]"
-            
-            context_parts.append(f"{source_info}\n{content}")
-        
-        return "\n\n---\n\n".join(context_parts)
-    
-    def _format_user_info(self, user_context: Optional[Dict]) -> str:
-        """
-        Форматирование информации о пользователе для системного промпта
-        
-        Args:
-            user_context: Контекст пользователя
-            
-        Returns:
-            Отформатированная строка с информацией
-        """
-        if not user_context:
-            return ""
-        
-        user_info_parts = ["\n\nИнформация о пользователе:"]
-        
-        if user_context.get('background'):
-            user_info_parts.append(f"- Бэкграунд: {user_context['background']}")
-        
-        if user_context.get('interests'):
-            interests = user_context['interests']
-            if isinstance(interests, list):
-                interests = ', '.join(interests)
-            user_info_parts.append(f"- Интересы: {interests}")
-        
-        if user_context.get('experience'):
-            user_info_parts.append(f"- Опыт: {user_context['experience']}")
-        
-        if user_context.get('preferred_program'):
-            user_info_parts.append(f"- Предпочитаемая программа: {user_context['preferred_program']}")
-        
-        if len(user_info_parts) > 1:
-            user_info_parts.append("\nУчитывай эту информацию при ответе, давая персонализированные рекомендации.")
-            return "\n".join(user_info_parts)
-        
+"""
+RAG Retriever с LLM-генерацией ответов и интеграцией рекомендательной системы
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
+from itertools import islice
+from typing import AsyncIterator, Awaitable, Callable, Deque, List, Dict, Optional, Sequence, Tuple
+import tiktoken
+from diskcache import Cache
+from openai import AsyncOpenAI
+import logging
+
+from config import settings
+from rag.llm_client import LLM_MAX_RETRIES, LLM_TIMEOUT, LLMClient
+from rag.vector_store import VectorStore
+from recommender.course_recommender import CourseRecommender
+from prompts.system_prompts import (
+    SYSTEM_PROMPT,
+    RELEVANCE_CHECK_PROMPT,
+    RECOMMENDATION_PROMPT,
+    ANSWER_PROMPT,
+    ENRICHMENT_PROMPT,
+    COMPARISON_CONTEXT_TEMPLATE,
+    COMPARISON_PROMPT,
+    ADMISSION_PROMPT,
+    FALLBACK_COMPARISON,
+    IRRELEVANT_QUESTION_MESSAGE,
+    RECOMMENDATIONS_ERROR_MESSAGE,
+    ADMISSION_ERROR_MESSAGE,
+    ANSWER_ERROR_MESSAGE,
+    PROMPT_VERSION
+)
+
+logger = logging.getLogger(__name__)
+
+# Ограничения кэша истории диалогов
+MAX_CACHED_USERS = 10_000
+MAX_HISTORY_MESSAGES = 20
+HISTORY_TTL_SECONDS = 24 * 3600
+
+# Сколько последних сообщений истории попадает в запрос (3 обмена)
+HISTORY_CONTEXT_MESSAGES = 6
+
+# Сколько результатов проверки релевантности держать в памяти
+RELEVANCE_CACHE_SIZE = 4096
+
+# Сколько описаний профиля (по отпечатку контекста) держать в памяти
+USER_INFO_CACHE_SIZE = 1024
+
+# Бюджет токенов на историю диалога в одном запросе
+MAX_HISTORY_TOKENS = 1500
+
+# Срок хранения ответов LLM на повторяющиеся запросы в дисковом кэше
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+NL = "\n"
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+
+class RAGRetriever:
+    """RAG-система для ответов на вопросы с рекомендациями курсов"""
+    
+    def __init__(self):
+        self.vector_store = VectorStore()
+        self.client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            timeout=LLM_TIMEOUT,
+            max_retries=LLM_MAX_RETRIES
+        )
+        # Все запросы к LLM идут через один клиент с общим ограничением
+        # одновременных запросов; непотоковые объединяются в пачки
+        self.llm = LLMClient(self.client, max_concurrency=settings.LLM_MAX_CONCURRENCY)
+        self.llm_cache = Cache(os.path.join(settings.DATA_DIR, settings.LLM_CACHE_DIRNAME))
+        self.recommender = CourseRecommender(
+            embedder=self.vector_store,
+            llm=self.llm,
+            llm_cache=self.llm_cache
+        )
+        
+        try:
+            self.encoding = tiktoken.encoding_for_model(settings.LLM_MODEL)
+        except KeyError:
+            # Неизвестная tiktoken модель: берём кодировку моделей GPT-4
+            self.encoding = tiktoken.get_encoding("cl100k_base")
+        
+        # LRU по пользователям: user_id -> (время последнего обращения, история)
+        self.conversation_cache: "OrderedDict[int, Tuple[float, Deque[Dict]]]" = OrderedDict()
+        self._history_lock = threading.Lock()
+        
+        # Результаты проверки релевантности по нормализованному вопросу
+        self._relevance_cache: "OrderedDict[str, Tuple[bool, str]]" = OrderedDict()
+        
+        # Описание профиля по отпечатку контекста пользователя
+        self._user_info_cached = lru_cache(maxsize=USER_INFO_CACHE_SIZE)(
+            self._build_user_info
+        )
+    
+    async def warmup(self) -> None:
+        """
+        Прогрев до первого вопроса: индекс и API эмбеддингов, эмбеддинги
+        курсов для рекомендаций, а также пул соединений с LLM API через
+        запрос на один токен
+        """
+        await asyncio.gather(
+            asyncio.to_thread(self.vector_store.warmup),
+            asyncio.to_thread(self.recommender.warmup),
+            self.client.chat.completions.create(
+                model=settings.LLM_MODEL,
+                messages=[{"role": "user", "content": "ping"}],
+                max_tokens=1
+            )
+        )
+    
+    async def check_relevance(self, query: str) -> Tuple[bool, str]:
+        """
+        Проверка релевантности вопроса тематике магистратур ИТМО
+        
+        Args:
+            query: Вопрос пользователя
+            
+        Returns:
+            (is_relevant, rejection_message)
+        """
+        # Нормализованный вопрос служит только ключом кэша,
+        # классификатор получает исходный текст
+        query_normalized = " ".join(query.lower().split())
+        
+        # Повторные вопросы не тратят отдельный LLM-запрос на классификацию
+        cached = self._relevance_cache.get(query_normalized)
+        if cached is not None:
+            self._relevance_cache.move_to_end(query_normalized)
+            return cached
+        
+        try:
+            result = await self._classify_relevance(query)
+        except Exception as e:
+            logger.error(f"Error checking relevance: {e}")
+            # В случае ошибки пропускаем проверку (и не кэшируем результат)
+            return True, ""
+        
+        self._relevance_cache[query_normalized] = result
+        while len(self._relevance_cache) > RELEVANCE_CACHE_SIZE:
+            self._relevance_cache.popitem(last=False)
+        return result
+    
+    async def _classify_relevance(self, query: str) -> Tuple[bool, str]:
+        """LLM-классификация вопроса; ошибки пробрасываются, чтобы не попасть в кэш"""
+        answer = (await self._complete(
+            [
+                {"role": "system", "content": RELEVANCE_CHECK_PROMPT},
+                {"role": "user", "content": query}
+            ],
+            temperature=0.1,
+            max_tokens=100
+        )).strip().lower()
+        
+        if "да" in answer or "yes" in answer or "релевант" in answer:
+            return True, ""
+        else:
+            return False, IRRELEVANT_QUESTION_MESSAGE
+    
+    async def retrieve_across_programs(self, query: str) -> List[int]:
+        """
+        Поиск по всем программам с дедупликацией; возвращает строки индекса
+        
+        Запрос эмбеддится один раз, индекс просматривается одним проходом без
+        фильтра, а найденное делится по программам: лучший документ каждой
+        программы попадает в ответ, остальные места — по близости.
+        """
+        try:
+            hits = await asyncio.to_thread(self._search_across_programs, query)
+        except Exception as e:
+            logger.error(f"Error searching vector store: {e}")
+            return []
+        
+        top_k = settings.TOP_K_RESULTS
+        contents = self.vector_store.contents
+        program_ids = self.vector_store.columns["program_id"]
+        
+        # hits уже отсортированы по расстоянию; повторы текста отбрасываются
+        unique_hits = []
+        seen = set()
+        for row, _ in hits:
+            if contents[row] not in seen:
+                seen.add(contents[row])
+                unique_hits.append(row)
+        
+        best_per_program = {}
+        for row in unique_hits:
+            best_per_program.setdefault(program_ids[row], row)
+        chosen = {
+            best_per_program[program_id]
+            for program_id in settings.PROGRAM_FILES
+            if program_id in best_per_program
+        }
+        
+        for row in unique_hits:
+            if len(chosen) >= top_k:
+                break
+            chosen.add(row)
+        
+        return [row for row in unique_hits if row in chosen]
+    
+    def _search_across_programs(self, query: str) -> List[Tuple[int, float]]:
+        """Один проход по индексу с запасом кандидатов на каждую программу"""
+        embedding = self.vector_store.embed_query(query)
+        candidates = settings.TOP_K_RESULTS * len(settings.PROGRAM_FILES)
+        return self.vector_store.search_ids_by_embeddings([embedding], top_k=candidates)[0]
+    
+    async def _stream_completion(
+        self,
+        messages: List[Dict],
+        temperature: float,
+        max_tokens: int
+    ) -> AsyncIterator[str]:
+        """Потоковая генерация: фрагменты ответа отдаются по мере поступления"""
+        async for part in self.llm.stream(
+            messages,
+            model=settings.LLM_MODEL,
+            temperature=temperature,
+            max_tokens=max_tokens
+        ):
+            yield part
+    
+    async def _complete(self, messages: List[Dict], temperature: float, max_tokens: int) -> str:
+        """Полный ответ LLM через общую очередь запросов"""
+        return await self.llm.submit(
+            messages,
+            model=settings.LLM_MODEL,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+    
+    async def _relevance_for(self, query: str, enabled: bool) -> Tuple[bool, str]:
+        """Проверка релевантности, если она включена"""
+        return await self.check_relevance(query) if enabled else (True, "")
+    
+    async def stream_answer(
+        self,
+        query: str,
+        user_context: Optional[Dict] = None,
+        user_id: Optional[int] = None,
+        check_relevance: bool = True,
+        history: Optional[Sequence[Dict]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Потоковое получение ответа на вопрос с использованием RAG
+        
+        Аргументы те же, что у get_answer. Ошибки генерации пробрасываются
+        вызывающему; в историю ответ попадает только целиком.
+        
+        Yields:
+            Фрагменты ответа
+        """
+        # Поиск запускается сразу, параллельно с проверкой релевантности,
+        # и отменяется, если вопрос окажется нерелевантным
+        rows_task = asyncio.create_task(self.retrieve_across_programs(query))
+        try:
+            is_relevant, rejection_message = await self._relevance_for(query, check_relevance)
+        except BaseException:
+            rows_task.cancel()
+            raise
+        
+        if not is_relevant:
+            rows_task.cancel()
+            yield rejection_message
+            return
+        
+        relevant_rows = await rows_task
+        
+        # Формируем контекст из найденных документов
+        context = self._format_context(relevant_rows)
+        
+        # Получаем историю диалога: переданную вызывающим или сохранённую по user_id
+        conversation_history = []
+        if history is not None:
+            conversation_history = self._trim_history(
+                list(islice(history, max(0, len(history) - HISTORY_CONTEXT_MESSAGES), None))
+            )
+        elif user_id:
+            conversation_history = self._trim_history(
+                self._get_recent_history(user_id, HISTORY_CONTEXT_MESSAGES)
+            )
+        
+        # Формируем сообщения для LLM: текущий вопрос с контекстом идёт последним
+        current_message = ANSWER_PROMPT.format(context=context, query=query)
+        messages = self._build_messages(current_message, user_context, conversation_history)
+        
+        # Генерируем ответ
+        parts = []
+        async for part in self._stream_completion(messages, settings.TEMPERATURE, 1000):
+            parts.append(part)
+            yield part
+        
+        # Сохраняем в историю
+        if user_id:
+            self._append_history(user_id, query, "".join(parts))
+    
+    async def get_answer(
+        self,
+        query: str,
+        user_context: Optional[Dict] = None,
+        user_id: Optional[int] = None,
+        check_relevance: bool = True,
+        history: Optional[Sequence[Dict]] = None
+    ) -> str:
+        """
+        Получение ответа на вопрос с использованием RAG
+        
+        Args:
+            query: Вопрос пользователя
+            user_context: Контекст пользователя (бэкграунд, интересы)
+            user_id: ID пользователя для кэширования истории
+            check_relevance: Проверять ли релевантность вопроса
+            history: История диалога, которую хранит вызывающий (вместо истории по user_id)
+            
+        Returns:
+            Ответ на вопрос
+        """
+        try:
+            return "".join([
+                part async for part in self.stream_answer(
+                    query,
+                    user_context=user_context,
+                    user_id=user_id,
+                    check_relevance=check_relevance,
+                    history=history
+                )
+            ])
+        except Exception as e:
+            logger.error(f"Error generating answer: {e}")
+            return ANSWER_ERROR_MESSAGE
+    
+    async def get_course_recommendations(
+        self,
+        user_background: str,
+        interests: List[str],
+        program: Optional[str] = None,
+        use_llm: bool = True
+    ) -> str:
+        """
+        Получение персонализированных рекомендаций по курсам
+        
+        Args:
+            user_background: Описание бэкграунда пользователя
+            interests: Список интересов
+            program: Фильтр по программе (опционально)
+            use_llm: Использовать ли LLM для дополнительной персонализации
+            
+        Returns:
+            Форматированные рекомендации
+        """
+        # Получаем рекомендации через рекомендательную систему; оценка
+        # запрашивает эмбеддинги интересов, поэтому идёт в отдельном потоке
+        recommendations = await asyncio.to_thread(
+            self.recommender.recommend_courses,
+            user_background=user_background,
+            interests=interests,
+            program=program,
+            max_recommendations=5
+        )
+        
+        if not recommendations:
+            return await self._get_fallback_recommendations(interests, program)
+        
+        # Форматируем базовые рекомендации
+        base_recommendations = self.recommender.format_recommendations(
+            recommendations, 
+            include_plan=True
+        )
+        
+        # Опционально обогащаем через LLM; для пустого профиля ему нечего
+        # добавить к базовым рекомендациям
+        if use_llm and ((user_background or "").strip() or interests):
+            try:
+                # В ключ входят все данные промпта: базовые рекомендации
+                # (от них зависят каталог и программа) и профиль как есть
+                return await self._cached_completion(
+                    "enrich_recommendations",
+                    (base_recommendations, user_background, tuple(interests)),
+                    self._enrich_recommendations_with_llm
+                )
+            except Exception as e:
+                logger.error(f"Error enriching recommendations: {e}")
+                return base_recommendations
+        
+        return base_recommendations
+    
+    async def _enrich_recommendations_with_llm(
+        self,
+        base_recommendations: str,
+        user_background: str,
+        interests: Sequence[str]
+    ) -> str:
+        """Обогащение рекомендаций через LLM"""
+        
+        prompt = ENRICHMENT_PROMPT.format(
+            user_background=user_background,
+            interests=', '.join(interests),
+            base_recommendations=base_recommendations
+        )
+        
+        return await self._complete(
+            self._build_messages(prompt),
+            temperature=0.4,
+            max_tokens=1500
+        )
+    
+    async def _get_fallback_recommendations(
+        self,
+        interests: List[str],
+        program: Optional[str] = None
+    ) -> str:
+        """Запасные рекомендации через поиск в векторной базе"""
+        
+        # Ищем информацию о выборных курсах
+        query = f"выборные курсы элективы {' '.join(interests)}"
+        if program:
+            query += f" программа {program}"
+        
+        try:
+            hits = await asyncio.to_thread(self.vector_store.search_ids, query, top_k=10)
+            context = self._format_context([row for row, _ in hits])
+            
+            prompt = RECOMMENDATION_PROMPT.format(
+                background="Не указан",
+                interests=", ".join(interests) if interests else "Общие",
+                courses_context=context
+            )
+            
+            return await self._complete(
+                self._build_messages(prompt),
+                temperature=settings.TEMPERATURE,
+                max_tokens=1500
+            )
+            
+        except Exception as e:
+            logger.error(f"Error in fallback recommendations: {e}")
+            return RECOMMENDATIONS_ERROR_MESSAGE
+    
+    async def _cached_completion(
+        self,
+        name: str,
+        args: Tuple,
+        generate: Callable[..., Awaitable[str]]
+    ) -> str:
+        """
+        Ответ LLM из дискового кэша или через generate(*args)
+        
+        Ключ включает хэш аргументов, модель и версию промптов, поэтому их
+        смена сбрасывает кэш. Исключения generate пробрасываются и в кэш не попадают.
+        """
+        args_digest = hashlib.blake2b(repr(args).encode("utf-8"), digest_size=16).hexdigest()
+        key = (name, args_digest, settings.LLM_MODEL, PROMPT_VERSION)
+        cached = self.llm_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        result = await generate(*args)
+        self.llm_cache.set(key, result, expire=LLM_CACHE_TTL_SECONDS)
+        return result
+    
+    async def compare_programs(self) -> str:
+        """
+        Сравнение программ AI и AI Product
+        
+        Returns:
+            Форматированное сравнение программ
+        """
+        try:
+            return await self._cached_completion("compare_programs", (), self._generate_comparison)
+        except Exception as e:
+            logger.error(f"Error comparing programs: {e}")
+            return self._get_fallback_comparison()
+    
+    async def _generate_comparison(self) -> str:
+        """Генерация сравнения программ по найденным документам"""
+        # Оба запроса независимы: эмбеддинги и поиск по индексу выполняются одним пакетом
+        ai_hits, product_hits = await asyncio.to_thread(
+            self.vector_store.search_ids_many,
+            [
+                "программа AI машинное обучение курсы",
+                "программа AI Product продукт менеджмент"
+            ],
+            top_k=5
+        )
+        
+        context = COMPARISON_CONTEXT_TEMPLATE.format(
+            ai_context=self._format_context([row for row, _ in ai_hits]),
+            product_context=self._format_context([row for row, _ in product_hits])
+        )
+        
+        return await self._complete(
+            self._build_messages(f"{context}\n\n{COMPARISON_PROMPT}"),
+            temperature=settings.TEMPERATURE,
+            max_tokens=1500
+        )
+    
+    def _get_fallback_comparison(self) -> str:
+        """Запасное сравнение программ"""
+        return FALLBACK_COMPARISON
+    
+    async def get_admission_info(self, program: Optional[str] = None) -> str:
+        """
+        Получение информации о поступлении
+        
+        Args:
+            program: Название программы (опционально)
+            
+        Returns:
+            Информация о поступлении
+        """
+        try:
+            return await self._cached_completion(
+                "get_admission_info", (program,), self._generate_admission_info
+            )
+        except Exception as e:
+            logger.error(f"Error getting admission info: {e}")
+            return ADMISSION_ERROR_MESSAGE
+    
+    async def _generate_admission_info(self, program: Optional[str]) -> str:
+        """Генерация ответа о поступлении по найденным документам"""
+        query = "требования поступление документы экзамены"
+        if program:
+            query += f" {program}"
+        
+        hits = await asyncio.to_thread(self.vector_store.search_ids, query, top_k=5)
+        context = self._format_context([row for row, _ in hits])
+        
+        prompt = ADMISSION_PROMPT.format(context=context)
+        
+        return await self._complete(
+            self._build_messages(prompt),
+            temperature=settings.TEMPERATURE,
+            max_tokens=1000
+        )
+    
+    def clear_user_history(self, user_id: int) -> None:
+        """Очистка истории диалога пользователя"""
+        with self._history_lock:
+            self.conversation_cache.pop(user_id, None)
+    
+    def _get_history(self, user_id: int) -> Optional[Deque[Dict]]:
+        """История диалога пользователя, если она не устарела (вызывать под блокировкой)"""
+        entry = self.conversation_cache.get(user_id)
+        if entry is None:
+            return None
+        
+        last_access, history = entry
+        if time.monotonic() - last_access > HISTORY_TTL_SECONDS:
+            del self.conversation_cache[user_id]
+            return None
+        
+        self.conversation_cache.move_to_end(user_id)
+        return history
+    
+    def _get_recent_history(self, user_id: int, n_messages: int) -> List[Dict]:
+        """Последние сообщения из истории диалога пользователя"""
+        with self._history_lock:
+            history = self._get_history(user_id)
+            if not history:
+                return []
+            # Хвост deque без промежуточной копии всей истории
+            return list(islice(history, max(0, len(history) - n_messages), None))
+    
+    def _append_history(self, user_id: int, query: str, answer: str) -> None:
+        """Сохранение обмена сообщениями с вытеснением давно неактивных пользователей"""
+        with self._history_lock:
+            history = self._get_history(user_id)
+            if history is None:
+                # deque с maxlen сам отбрасывает старые сообщения
+                history = deque(maxlen=MAX_HISTORY_MESSAGES)
+            
+            history.append({"role": "user", "content": query})
+            history.append({"role": "assistant", "content": answer})
+            
+            self.conversation_cache[user_id] = (time.monotonic(), history)
+            self.conversation_cache.move_to_end(user_id)
+            while len(self.conversation_cache) > MAX_CACHED_USERS:
+                self.conversation_cache.popitem(last=False)
+    
+    def _trim_history(self, history: List[Dict]) -> List[Dict]:
+        """Отбрасывание старых обменов, пока история не уложится в MAX_HISTORY_TOKENS"""
+        sizes = [len(self.encoding.encode(message["content"])) for message in history]
+        total = sum(sizes)
+        
+        # История хранится парами вопрос-ответ, поэтому удаляем по два сообщения
+        start = 0
+        while total > MAX_HISTORY_TOKENS and start < len(history):
+            total -= sum(sizes[start:start + 2])
+            start += 2
+        return history[start:]
+    
+    def _format_context(self, rows: List[int]) -> str:
+        """
+        Форматирование контекста из найденных документов
+        
+        Args:
+            rows: Строки индекса векторного хранилища
+            
+        Returns:
+            Отформатированный контекст
+        """
+        if not rows:
+            return "Релевантная информация не найдена в базе знаний."
+        
+        # Поля читаются из столбцов хранилища по номеру строки, без словарей
+        contents = self.vector_store.contents
+        programs = self.vector_store.columns["program"]
+        courses = self.vector_store.columns["course"]
+        
+        context_parts = []
+        for row in rows:
+            source_parts = []
+            if programs[row]:
+                source_parts.append(f"[Программа: {programs[row]}]")
+            if courses[row]:
+                source_parts.append(f"[Курс: {courses[row]}]")
+            
+            # Длинные документы обрезаются один раз при индексации
+            context_parts.append(" ".join(source_parts) + NL + contents[row])
+        
+        return CONTEXT_SEPARATOR.join(context_parts)
+    
+    def _build_messages(
+        self,
+        task: str,
+        user_context: Optional[Dict] = None,
+        history: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """
+        Сообщения для LLM в неизменном порядке: общий системный промпт,
+        профиль пользователя, история, задача
+        
+        Первое сообщение побайтно одинаково во всех вызовах, поэтому
+        на стороне API срабатывает кэширование префикса промпта.
+        """
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        
+        user_info = self._user_info(user_context)
+        if user_info:
+            messages.append({"role": "system", "content": user_info})
+        
+        if history:
+            messages.extend(history)
+        
+        messages.append({"role": "user", "content": task})
+        return messages
+    
+    def _user_info(self, user_context: Optional[Dict]) -> str:
+        """Описание профиля пользователя с кэшированием по отпечатку контекста"""
+        if not user_context:
+            return ""
+        
+        fingerprint = tuple(sorted(
+            (key, tuple(value) if isinstance(value, list) else value)
+            for key, value in user_context.items()
+        ))
+        return self._user_info_cached(fingerprint)
+    
+    def _build_user_info(self, fingerprint: Tuple) -> str:
+        """Сборка описания профиля по отпечатку контекста"""
+        return self._format_user_info(dict(fingerprint))
+    
+    def _format_user_info(self, user_context: Optional[Dict]) -> str:
+        """
+        Форматирование информации о пользователе для отдельного системного сообщения
+        
+        Args:
+            user_context: Контекст пользователя
+            
+        Returns:
+            Отформатированная строка с информацией
+        """
+        if not user_context:
+            return ""
+        
+        user_info_parts = ["Информация о пользователе:"]
+        
+        if user_context.get('background'):
+            user_info_parts.append(f"- Бэкграунд: {user_context['background']}")
+        
+        if user_context.get('interests'):
+            interests = user_context['interests']
+            if isinstance(interests, (list, tuple)):
+                interests = ', '.join(interests)
+            user_info_parts.append(f"- Интересы: {interests}")
+        
+        if user_context.get('experience'):
+            user_info_parts.append(f"- Опыт: {user_context['experience']}")
+        
+        if user_context.get('preferred_program'):
+            user_info_parts.append(f"- Предпочитаемая программа: {user_context['preferred_program']}")
+        
+        if len(user_info_parts) > 1:
+            user_info_parts.append("\nУчитывай эту информацию при ответе, давая персонализированные рекомендации.")
+            return "\n".join(user_info_parts)
+        
         return ""
\ No newline at end of file
@@ -1,165 +1,426 @@
-"""
-Векторное хранилище для RAG
-"""
-import json
-from typing import List, Dict
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-import logging
-
-from config import settings
-
-logger = logging.getLogger(__name__)
-
-
-class VectorStore:
-    """Векторное хранилище на базе ChromaDB"""
-    
-    def __init__(self):
-        self.embeddings = OpenAIEmbeddings(
-            model=settings.EMBEDDING_MODEL,
-            openai_api_key=settings.OPENAI_API_KEY
-        )
-        
-        self.client = chromadb.PersistentClient(
-            path=settings.CHROMA_DIR,
-            settings=ChromaSettings(anonymized_telemetry=False)
-        )
-        
-        self.collection = self.client.get_or_create_collection(
-            name="itmo_programs",
-            metadata={"hnsw:space": "cosine"}
-        )
-        
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-    
-    def load_and_index_programs(self):
-        """Загрузка и индексация программ"""
-        programs_data = []
-        
-        # Загружаем данные программ
-        for filename in ["ai_program.json", "ai_product_program.json"]:
-            filepath = f"{settings.DATA_DIR}/{filename}"
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    programs_data.append(data)
-            except FileNotFoundError:
-                logger.warning(f"File not found: {filepath}")
-        
-        # Подготавливаем документы для индексации
-        documents = []
-        metadatas = []
-        ids = []
-        
-        for idx, program in enumerate(programs_data):
-            # Основная информация о программе
-            program_text = self._format_program_text(program)
-            chunks = self.text_splitter.split_text(program_text)
-            
-            for chunk_idx, chunk in enumerate(chunks):
-                doc_id = f"{program['name']}_{chunk_idx}"
-                documents.append(chunk)
-                metadatas.append({
-                    "program": program['name'],
-                    "url": program['url'],
-                    "type": "general"
-                })
-                ids.append(doc_id)
-            
-            # Информация о курсах
-            for course in program.get('courses', []):
-                course_text = self._format_course_text(course, program['name'])
-                doc_id = f"{program['name']}_course_{course['name']}"
-                documents.append(course_text)
-                metadatas.append({
-                    "program": program['name'],
-                    "course": course['name'],
-                    "type": "course",
-                    "course_type": course.get('course_type', 'unknown')
-                })
-                ids.append(doc_id)
-        
-        # Получаем эмбеддинги
-        if documents:
-            embeddings = self.embeddings.embed_documents(documents)
-            
-            # Добавляем в коллекцию
-            self.collection.add(
-                documents=documents,
-                embeddings=embeddings,
-                metadatas=metadatas,
-                ids=ids
-            )
-            
-            logger.info(f"Indexed {len(documents)} documents")
-    
-    def _format_program_text(self, program: Dict) -> str:
-        """Форматирование информации о программе"""
-        text = f"""
-        Программа: {program['name']}
-        URL: {program['url']}
-        
-        Описание: {program.get('description', 'Нет описания')}
-        
-        Срок обучения: {program.get('duration', '2 года')}
-        Формат: {program.get('format', 'Очная')}
-        
-        Требования для поступления:
-        {chr(10).join('- ' + req for req in program.get('admission_requirements', []))}
-        
-        Карьерные перспективы:
-        {chr(10).join('- ' + career for career in program.get('career_prospects', []))}
-        
-        Ключевые компетенции:
-        {chr(10).join('- ' + comp for comp in program.get('key_competencies', []))}
-        """
-        return text.strip()
-    
-    def _format_course_text(self, course: Dict, program_name: str) -> str:
-        """Форматирование информации о курсе"""
-        text = f"""
-        Программа: {program_name}
-        Курс: {course['name']}
-        Семестр: {course.get('semester', 'Не указан')}
-        Кредиты: {course.get('credits', 'Не указаны')}
-        Тип: {course.get('course_type', 'Не указан')}
-        Описание: {course.get('description', 'Нет описания')}
-        """
-        return text.strip()
-    
-    def search(self, query: str, top_k: int = None, filter_dict: Dict = None) -> List[Dict]:
-        """Поиск релевантных документов"""
-        top_k = top_k or settings.TOP_K_RESULTS
-        
-        query_embedding = self.embeddings.embed_query(query)
-        
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where=filter_dict
-        )
-        
-        documents = []
-        for i in range(len(results['documents'][0])):
-            documents.append({
-                "content": results['documents'][0][i],
-                "metadata": results['metadatas'][0][i],
-                "distance": results['distances'][0][i] if 'distances' in results else None
-            })
-        
-        return documents
-    
-    def clear(self):
-        """Очистка коллекции"""
-        self.client.delete_collection("itmo_programs")
-        self.collection = self.client.create_collection(
-            name="itmo_programs",
-            metadata={"hnsw:space": "cosine"}
-        )
\ No newline at end of file
+"""
+Векторное хранилище для RAG
+"""
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+import faiss
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_openai import OpenAIEmbeddings
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Размер пачки документов в одном запросе к API эмбеддингов
+EMBEDDING_BATCH_SIZE = 512
+
+# Сколько эмбеддингов запросов держать в памяти
+QUERY_CACHE_SIZE = 2048
+
+# Файлы индекса и метаданных в settings.INDEX_DIR
+INDEX_FILENAME = "itmo.faiss"
+METADATA_FILENAME = "itmo_meta.pkl"
+
+# Число связей на вершину графа HNSW
+HNSW_M = 32
+
+# Кэш эмбеддингов документов в settings.DATA_DIR: ключ — хэш содержимого
+EMBEDDING_CACHE_FILENAME = "emb_cache.db"
+
+# Ограничение SQLite на число параметров в одном запросе
+SQLITE_MAX_PARAMS = 500
+
+# Сколько токенов LLM-модели документ может занять в контексте ответа
+MAX_DOCUMENT_TOKENS = 400
+
+# Поля метаданных: каждое хранится отдельным столбцом параллельно строкам индекса
+METADATA_FIELDS = ("program", "program_id", "url", "course", "type", "course_type")
+
+NL = "\n"
+
+# Текст курса для индексации; недостающие поля подставляет _CourseFields
+_COURSE_TMPL = (
+    "Программа: {program_name}\n"
+    "Курс: {name}\n"
+    "Семестр: {semester}\n"
+    "Кредиты: {credits}\n"
+    "Тип: {course_type}\n"
+    "Описание: {description}"
+)
+
+
+class _CourseFields(dict):
+    """Поля курса для шаблона: отсутствующий ключ получает значение по умолчанию"""
+    
+    _DEFAULTS = {"credits": "Не указаны", "description": "Нет описания"}
+    
+    def __missing__(self, key: str) -> str:
+        return self._DEFAULTS.get(key, "Не указан")
+
+
+def _embedding_model_id() -> str:
+    """Идентификатор текущей модели эмбеддингов"""
+    if settings.EMBEDDING_BACKEND == "onnx":
+        return f"onnx:{os.path.basename(os.path.normpath(settings.LOCAL_EMBEDDING_MODEL_DIR))}"
+    return f"{settings.EMBEDDING_MODEL}:{settings.EMBEDDING_DIMENSIONS}"
+
+
+def _document_cache_key(document: str) -> str:
+    """Ключ кэша документа: зависит от текста и модели эмбеддингов"""
+    payload = f"{_embedding_model_id()}:{document}"
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _query_cache_key(query: str) -> bytes:
+    """Ключ кэша: хэш запроса без учёта регистра и лишних пробелов"""
+    normalized = " ".join(query.lower().split())
+    return hashlib.sha1(normalized.encode()).digest()
+
+
+class VectorStore:
+    """Векторное хранилище на базе FAISS"""
+    
+    def __init__(self):
+        if settings.EMBEDDING_BACKEND == "onnx":
+            # Локальная модель: запрос не ходит в сеть, размерность задаёт модель
+            from rag.embeddings import ONNXEmbeddings
+            
+            self.embeddings = ONNXEmbeddings(settings.LOCAL_EMBEDDING_MODEL_DIR)
+            self._embed_query_batch = self.embeddings.embed_queries
+        else:
+            # Модели text-embedding-3 отдают укороченный вектор без заметной
+            # потери качества поиска: индекс меньше, а сравнение векторов быстрее
+            self.embeddings = OpenAIEmbeddings(
+                model=settings.EMBEDDING_MODEL,
+                dimensions=settings.EMBEDDING_DIMENSIONS,
+                openai_api_key=settings.OPENAI_API_KEY
+            )
+            self._embed_query_batch = self.embeddings.embed_documents
+        
+        # Индекс и метаданные целиком в памяти: строка индекса FAISS
+        # совпадает с позицией документа в contents и в каждом столбце columns
+        # (пустая строка — поле у документа отсутствует)
+        self.index_path = os.path.join(settings.INDEX_DIR, INDEX_FILENAME)
+        self.metadata_path = os.path.join(settings.INDEX_DIR, METADATA_FILENAME)
+        self.index: Optional[faiss.Index] = None
+        self.contents: List[str] = []
+        self.columns: Dict[str, List[str]] = {field: [] for field in METADATA_FIELDS}
+        self._load()
+        
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            separators=["\n\n", "\n", ". ", " ", ""]
+        )
+        
+        # Эмбеддинги недавних запросов: повторный вопрос не ходит в API
+        self._query_cache: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+    
+    def load_and_index_programs(self):
+        """Загрузка и индексация программ"""
+        programs_data = []
+        
+        # Загружаем данные программ
+        for program_id, filename in settings.PROGRAM_FILES.items():
+            filepath = f"{settings.DATA_DIR}/{filename}"
+            try:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                    programs_data.append((program_id, data))
+            except FileNotFoundError:
+                logger.warning(f"File not found: {filepath}")
+        
+        # Подготавливаем документы для индексации
+        documents = []
+        metadatas = []
+        
+        for program_id, program in programs_data:
+            # Основная информация о программе
+            program_text = self._format_program_text(program)
+            chunks = self.text_splitter.split_text(program_text)
+            
+            for chunk in chunks:
+                documents.append(chunk)
+                metadatas.append({
+                    "program": program['name'],
+                    "program_id": program_id,
+                    "url": program['url'],
+                    "type": "general"
+                })
+            
+            # Информация о курсах
+            for course in program.get('courses', []):
+                course_text = self._format_course_text(course, program['name'])
+                documents.append(course_text)
+                metadatas.append({
+                    "program": program['name'],
+                    "program_id": program_id,
+                    "course": course['name'],
+                    "type": "course",
+                    "course_type": course.get('course_type', 'unknown')
+                })
+        
+        if documents:
+            documents = self._truncate_documents(documents)
+            embeddings = self._embed_documents(documents)
+            self._add(documents, embeddings, metadatas)
+            self._save()
+            
+            logger.info(f"Indexed {len(documents)} documents")
+    
+    def _truncate_documents(self, documents: List[str]) -> List[str]:
+        """Обрезка документов до MAX_DOCUMENT_TOKENS токенов LLM-модели"""
+        # Нужен только при индексации, поэтому бот его не импортирует
+        import tiktoken
+        
+        try:
+            encoding = tiktoken.encoding_for_model(settings.LLM_MODEL)
+        except KeyError:
+            # Неизвестная tiktoken модель: берём кодировку моделей GPT-4
+            encoding = tiktoken.get_encoding("cl100k_base")
+        
+        truncated = []
+        for document, tokens in zip(documents, encoding.encode_batch(documents)):
+            if len(tokens) > MAX_DOCUMENT_TOKENS:
+                document = encoding.decode(tokens[:MAX_DOCUMENT_TOKENS])
+            truncated.append(document)
+        return truncated
+    
+    def _embed_documents(self, documents: List[str]) -> List[np.ndarray]:
+        """Эмбеддинги документов: в API уходят только новые или изменённые"""
+        keys = [_document_cache_key(document) for document in documents]
+        
+        conn = sqlite3.connect(os.path.join(settings.DATA_DIR, EMBEDDING_CACHE_FILENAME))
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            
+            cached = {}
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), SQLITE_MAX_PARAMS):
+                batch = unique_keys[start:start + SQLITE_MAX_PARAMS]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                cached.update((key, np.frombuffer(vector, dtype='float32')) for key, vector in rows)
+            
+            missing = {key: document for key, document in zip(keys, documents) if key not in cached}
+            logger.info(f"Embedding cache: {len(keys) - len(missing)} hits, {len(missing)} misses")
+            
+            # Недостающие эмбеддинги запрашиваем пачками, чтобы уложиться
+            # в лимит токенов на запрос
+            missing_keys = list(missing)
+            for start in range(0, len(missing_keys), EMBEDDING_BATCH_SIZE):
+                batch = missing_keys[start:start + EMBEDDING_BATCH_SIZE]
+                embeddings = self.embeddings.embed_documents([missing[key] for key in batch])
+                vectors = [np.asarray(embedding, dtype='float32') for embedding in embeddings]
+                
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                        [(key, vector.tobytes()) for key, vector in zip(batch, vectors)]
+                    )
+                cached.update(zip(batch, vectors))
+        finally:
+            conn.close()
+        
+        return [cached[key] for key in keys]
+    
+    def _add(self, documents: List[str], embeddings: List[np.ndarray], metadatas: List[Dict]):
+        """Добавление документов в индекс"""
+        # Скалярное произведение нормированных векторов равно косинусной близости
+        vectors = np.asarray(embeddings, dtype='float32')
+        faiss.normalize_L2(vectors)
+        
+        if self.index is None:
+            # 8-битное скалярное квантование: вектор занимает d байт вместо 4·d
+            self.index = faiss.IndexHNSWSQ(
+                vectors.shape[1],
+                faiss.ScalarQuantizer.QT_8bit,
+                HNSW_M,
+                faiss.METRIC_INNER_PRODUCT
+            )
+        
+        if not self.index.is_trained:
+            # Диапазоны квантования подбираются по индексируемому набору
+            self.index.train(vectors)
+        
+        self.index.add(vectors)
+        self.contents.extend(documents)
+        for field, column in self.columns.items():
+            column.extend(metadata.get(field, "") for metadata in metadatas)
+    
+    def _save(self):
+        """Сохранение индекса и метаданных на диск"""
+        os.makedirs(settings.INDEX_DIR, exist_ok=True)
+        faiss.write_index(self.index, self.index_path)
+        with open(self.metadata_path, 'wb') as f:
+            pickle.dump({"contents": self.contents, "columns": self.columns}, f)
+    
+    def _load(self):
+        """Загрузка сохранённого индекса, если он есть"""
+        if not (os.path.exists(self.index_path) and os.path.exists(self.metadata_path)):
+            logger.warning(f"Vector index not found in {settings.INDEX_DIR}")
+            return
+        
+        self.index = faiss.read_index(self.index_path)
+        with open(self.metadata_path, 'rb') as f:
+            data = pickle.load(f)
+        
+        self.contents = data["contents"]
+        self.columns = data["columns"]
+    
+    def _format_program_text(self, program: Dict) -> str:
+        """Форматирование информации о программе"""
+        parts = [
+            f"Программа: {program['name']}",
+            f"URL: {program['url']}",
+            "",
+            f"Описание: {program.get('description', 'Нет описания')}",
+            "",
+            f"Срок обучения: {program.get('duration', '2 года')}",
+            f"Формат: {program.get('format', 'Очная')}",
+            "",
+            "Требования для поступления:",
+        ]
+        parts.extend(f"- {req}" for req in program.get('admission_requirements', []))
+        parts.extend(("", "Карьерные перспективы:"))
+        parts.extend(f"- {career}" for career in program.get('career_prospects', []))
+        parts.extend(("", "Ключевые компетенции:"))
+        parts.extend(f"- {comp}" for comp in program.get('key_competencies', []))
+        return NL.join(parts)
+    
+    def _format_course_text(self, course: Dict, program_name: str) -> str:
+        """Форматирование информации о курсе"""
+        return _COURSE_TMPL.format_map(_CourseFields(course, program_name=program_name))
+    
+    def embed_documents(self, documents: List[str]) -> np.ndarray:
+        """Матрица эмбеддингов документов через дисковый кэш"""
+        return np.vstack(self._embed_documents(documents))
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Эмбеддинги запросов: из кэша, а недостающие — одним запросом к API"""
+        keys = [_query_cache_key(query) for query in queries]
+        
+        with self._query_cache_lock:
+            cached = {key: self._query_cache.get(key) for key in keys}
+        
+        missing = {key: query for key, query in zip(keys, queries) if cached[key] is None}
+        if missing:
+            embeddings = self._embed_query_batch(list(missing.values()))
+            cached.update(zip(missing, embeddings))
+        
+        with self._query_cache_lock:
+            for key in keys:
+                self._query_cache[key] = cached[key]
+                self._query_cache.move_to_end(key)
+            while len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        
+        return [cached[key] for key in keys]
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Эмбеддинг одного запроса с кэшированием"""
+        return self.embed_queries([query])[0]
+    
+    def search(self, query: str, top_k: int = None, filter_dict: Dict = None) -> List[Dict]:
+        """Поиск релевантных документов"""
+        return self.search_by_embedding(self.embed_query(query), top_k, filter_dict)
+    
+    def search_ids(
+        self,
+        query: str,
+        top_k: int = None,
+        filter_dict: Dict = None
+    ) -> List[Tuple[int, float]]:
+        """Поиск строк индекса: пары (строка, расстояние) по возрастанию расстояния"""
+        return self.search_ids_by_embeddings([self.embed_query(query)], top_k, filter_dict)[0]
+    
+    def search_ids_many(
+        self,
+        queries: List[str],
+        top_k: int = None,
+        filter_dict: Dict = None
+    ) -> List[List[Tuple[int, float]]]:
+        """Поиск строк по нескольким запросам: один запрос за эмбеддингами и один проход по индексу"""
+        return self.search_ids_by_embeddings(self.embed_queries(queries), top_k, filter_dict)
+    
+    def search_by_embedding(
+        self,
+        query_embedding: List[float],
+        top_k: int = None,
+        filter_dict: Dict = None
+    ) -> List[Dict]:
+        """Поиск релевантных документов по готовому эмбеддингу"""
+        return [
+            self.document(row, distance)
+            for row, distance in self.search_ids_by_embeddings([query_embedding], top_k, filter_dict)[0]
+        ]
+    
+    def search_ids_by_embeddings(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = None,
+        filter_dict: Dict = None
+    ) -> List[List[Tuple[int, float]]]:
+        """Пакетный поиск строк: все запросы обрабатываются одним вызовом index.search"""
+        top_k = top_k or settings.TOP_K_RESULTS
+        
+        if self.index is None or self.index.ntotal == 0:
+            return [[] for _ in query_embeddings]
+        
+        queries = np.asarray(query_embeddings, dtype='float32')
+        faiss.normalize_L2(queries)
+        
+        # Корпус небольшой: при фильтре просматриваем все документы
+        # и отбираем подходящие уже после поиска
+        n_candidates = self.index.ntotal if filter_dict else min(top_k, self.index.ntotal)
+        scores, indices = self.index.search(queries, n_candidates)
+        
+        filters = [(self.columns[key], value) for key, value in (filter_dict or {}).items()]
+        
+        results = []
+        for row_scores, row_indices in zip(scores, indices):
+            hits = []
+            for score, row in zip(row_scores.tolist(), row_indices.tolist()):
+                if row < 0:
+                    continue
+                if any(column[row] != value for column, value in filters):
+                    continue
+                
+                hits.append((row, 1.0 - score))
+                if len(hits) == top_k:
+                    break
+            results.append(hits)
+        
+        return results
+    
+    def document(self, row: int, distance: Optional[float] = None) -> Dict:
+        """Документ строки индекса в виде словаря content/metadata/distance"""
+        metadata = {field: column[row] for field, column in self.columns.items() if column[row]}
+        return {"content": self.contents[row], "metadata": metadata, "distance": distance}
+    
+    def warmup(self):
+        """Прогрев: соединение с API эмбеддингов и первый проход по графу индекса"""
+        self.search_by_embedding(self.embed_query("warmup"), top_k=1)
+    
+    def clear(self):
+        """Очистка индекса"""
+        self.index = None
+        self.contents = []
+        self.columns = {field: [] for field in METADATA_FIELDS}
+        
+        for path in (self.index_path, self.metadata_path):
+            if os.path.exists(path):
+                os.remove(path)
\ No newline at end of file
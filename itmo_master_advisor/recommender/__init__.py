@@ -1,15 +1,15 @@
-from .course_recommender import (
-    CourseRecommender,
-    Course,
-    CourseRecommendation,
-    UserSkills,
-    SkillLevel
-)
-
-__all__ = [
-    "CourseRecommender",
-    "Course", 
-    "CourseRecommendation",
-    "UserSkills",
-    "SkillLevel"
+from .course_recommender import (
+    CourseRecommender,
+    Course,
+    CourseRecommendation,
+    UserSkills,
+    SkillLevel
+)
+
+__all__ = [
+    "CourseRecommender",
+    "Course", 
+    "CourseRecommendation",
+    "UserSkills",
+    "SkillLevel"
 ]
\ No newline at end of file
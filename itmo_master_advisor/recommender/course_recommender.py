@@ -1,510 +1,965 @@
-"""
-Рекомендательная система для выбора курсов
-"""
-from typing import List, Dict, Optional
-from dataclasses import dataclass
-from enum import Enum
-import json
-import logging
-
-from openai import OpenAI
-from config import settings
-
-logger = logging.getLogger(__name__)
-
-
-class SkillLevel(Enum):
-    """Уровни владения навыками"""
-    NONE = "none"
-    BEGINNER = "beginner"
-    INTERMEDIATE = "intermediate"
-    ADVANCED = "advanced"
-
-
-@dataclass
-class UserSkills:
-    """Навыки пользователя"""
-    python: SkillLevel = SkillLevel.NONE
-    math: SkillLevel = SkillLevel.NONE
-    statistics: SkillLevel = SkillLevel.NONE
-    ml_basics: SkillLevel = SkillLevel.NONE
-    deep_learning: SkillLevel = SkillLevel.NONE
-    nlp: SkillLevel = SkillLevel.NONE
-    computer_vision: SkillLevel = SkillLevel.NONE
-    mlops: SkillLevel = SkillLevel.NONE
-    
-    @classmethod
-    def from_background(cls, background: str) -> "UserSkills":
-        """Создание профиля навыков из текстового описания"""
-        # Простая эвристика — в реальности можно использовать LLM
-        background_lower = background.lower()
-        
-        skills = cls()
-        
-        # Python
-        if any(word in background_lower for word in ["python", "питон", "программирован"]):
-            skills.python = SkillLevel.INTERMEDIATE
-        if "senior" in background_lower or "lead" in background_lower:
-            skills.python = SkillLevel.ADVANCED
-            
-        # Математика
-        if any(word in background_lower for word in ["математик", "math", "физик", "мехмат"]):
-            skills.math = SkillLevel.ADVANCED
-            skills.statistics = SkillLevel.INTERMEDIATE
-            
-        # ML
-        if any(word in background_lower for word in ["ml", "machine learning", "машинн"]):
-            skills.ml_basics = SkillLevel.INTERMEDIATE
-            
-        if any(word in background_lower for word in ["data scien", "ds", "аналитик данных"]):
-            skills.ml_basics = SkillLevel.INTERMEDIATE
-            skills.statistics = SkillLevel.INTERMEDIATE
-            
-        # Deep Learning
-        if any(word in background_lower for word in ["deep learning", "нейронн", "pytorch", "tensorflow"]):
-            skills.deep_learning = SkillLevel.INTERMEDIATE
-            
-        # NLP
-        if any(word in background_lower for word in ["nlp", "нлп", "обработка текст", "natural language"]):
-            skills.nlp = SkillLevel.INTERMEDIATE
-            
-        # CV
-        if any(word in background_lower for word in ["computer vision", "cv", "компьютерн зрен", "opencv"]):
-            skills.computer_vision = SkillLevel.INTERMEDIATE
-            
-        # MLOps
-        if any(word in background_lower for word in ["mlops", "devops", "docker", "kubernetes", "deploy"]):
-            skills.mlops = SkillLevel.INTERMEDIATE
-            
-        return skills
-
-
-@dataclass
-class Course:
-    """Информация о курсе"""
-    name: str
-    program: str
-    semester: int
-    course_type: str
-    credits: int
-    description: str = ""
-    prerequisites: List[str] = None
-    skills_gained: List[str] = None
-    difficulty: str = "medium"
-    
-    def __post_init__(self):
-        if self.prerequisites is None:
-            self.prerequisites = []
-        if self.skills_gained is None:
-            self.skills_gained = []
-
-
-@dataclass 
-class CourseRecommendation:
-    """Рекомендация курса"""
-    course: Course
-    score: float
-    reasoning: str
-    priority: int  # 1 = высший приоритет
-
-
-class CourseRecommender:
-    """Рекомендательная система для курсов"""
-    
-    def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.courses = self._load_courses()
-    
-    def _load_courses(self) -> List[Course]:
-        """Загрузка курсов из JSON файлов"""
-        courses = []
-        
-        for filename in ["ai_program.json", "ai_product_program.json"]:
-            filepath = f"{settings.DATA_DIR}/{filename}"
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    program_name = data.get('name', 'Unknown')
-                    
-                    for course_data in data.get('courses', []):
-                        course = Course(
-                            name=course_data['name'],
-                            program=program_name,
-                            semester=course_data.get('semester', 1),
-                            course_type=course_data.get('course_type', 'обязательная'),
-                            credits=course_data.get('credits', 3),
-                            description=course_data.get('description', ''),
-                            prerequisites=course_data.get('prerequisites', []),
-                            skills_gained=course_data.get('skills', [])
-                        )
-                        courses.append(course)
-                        
-            except FileNotFoundError:
-                logger.warning(f"File not found: {filepath}")
-            except json.JSONDecodeError:
-                logger.error(f"Invalid JSON in {filepath}")
-        
-        # Добавляем дефолтные курсы, если файлы не найдены
-        if not courses:
-            courses = self._get_default_courses()
-            
-        return courses
-    
-    def _get_default_courses(self) -> List[Course]:
-        """Дефолтный список курсов"""
-        return [
-            # AI Program - Обязательные
-            Course("Машинное обучение", "AI", 1, "обязательная", 4,
-                   "Основы ML: регрессия, классификация, кластеризация",
-                   prerequisites=["Python", "Линейная алгебра"],
-                   skills_gained=["sklearn", "pandas", "ML pipelines"]),
-            
-            Course("Глубокое обучение", "AI", 2, "обязательная", 4,
-                   "Нейронные сети, CNN, RNN, Transformers",
-                   prerequisites=["Машинное обучение"],
-                   skills_gained=["PyTorch", "Нейронные сети"]),
-            
-            Course("Математическая статистика", "AI", 1, "обязательная", 3,
-                   "Статистические методы для ML",
-                   prerequisites=["Теория вероятностей"],
-                   skills_gained=["Статистический анализ", "A/B тесты"]),
-            
-            Course("MLOps", "AI", 3, "обязательная", 3,
-                   "Развёртывание и мониторинг ML-систем",
-                   prerequisites=["Машинное обучение", "Docker"],
-                   skills_gained=["Docker", "CI/CD", "Model serving"]),
-            
-            # AI Program - Выборные
-            Course("Компьютерное зрение", "AI", 2, "выборная", 3,
-                   "Обработка изображений, детекция, сегментация",
-                   prerequisites=["Глубокое обучение"],
-                   skills_gained=["OpenCV", "CNN", "Object Detection"],
-                   difficulty="high"),
-            
-            Course("Обработка естественного языка", "AI", 2, "выборная", 3,
-                   "NLP: токенизация, эмбеддинги, трансформеры",
-                   prerequisites=["Глубокое обучение"],
-                   skills_gained=["Transformers", "BERT", "Text processing"],
-                   difficulty="high"),
-            
-            Course("Reinforcement Learning", "AI", 3, "выборная", 3,
-                   "Обучение с подкреплением",
-                   prerequisites=["Глубокое обучение", "Теория вероятностей"],
-                   skills_gained=["RL algorithms", "Gym", "Policy optimization"],
-                   difficulty="high"),
-            
-            Course("Генеративные модели", "AI", 3, "выборная", 3,
-                   "VAE, GAN, Diffusion models",
-                   prerequisites=["Глубокое обучение"],
-                   skills_gained=["GANs", "Diffusion", "Image generation"],
-                   difficulty="high"),
-            
-            Course("Big Data", "AI", 2, "выборная", 3,
-                   "Spark, распределённые вычисления",
-                   prerequisites=["Python", "SQL"],
-                   skills_gained=["Spark", "Hadoop", "Distributed computing"]),
-            
-            # AI Product - Специфичные
-            Course("Управление AI-продуктом", "AI Product", 1, "обязательная", 3,
-                   "Product management для AI-продуктов",
-                   prerequisites=[],
-                   skills_gained=["Product thinking", "Roadmap", "Metrics"]),
-            
-            Course("Дизайн AI-систем", "AI Product", 2, "обязательная", 3,
-                   "Проектирование архитектуры ML-систем",
-                   prerequisites=["Машинное обучение"],
-                   skills_gained=["System design", "ML architecture"]),
-            
-            Course("AI Ethics", "AI Product", 2, "выборная", 2,
-                   "Этика искусственного интеллекта",
-                   prerequisites=[],
-                   skills_gained=["AI Ethics", "Responsible AI", "Bias detection"]),
-        ]
-    
-    def get_elective_courses(self, program: Optional[str] = None) -> List[Course]:
-        """Получение списка выборных курсов"""
-        courses = [c for c in self.courses if c.course_type == "выборная"]
-        
-        if program:
-            courses = [c for c in courses if program.lower() in c.program.lower()]
-            
-        return courses
-    
-    def recommend_courses(
-        self,
-        user_background: str,
-        interests: List[str],
-        program: Optional[str] = None,
-        max_recommendations: int = 5
-    ) -> List[CourseRecommendation]:
-        """
-        Рекомендация курсов на основе профиля пользователя
-        
-        Args:
-            user_background: Текстовое описание бэкграунда
-            interests: Список интересов
-            program: Фильтр по программе (опционально)
-            max_recommendations: Максимум рекомендаций
-            
-        Returns:
-            Список рекомендаций с оценками
-        """
-        # Анализируем навыки пользователя
-        user_skills = UserSkills.from_background(user_background)
-        
-        # Получаем выборные курсы
-        electives = self.get_elective_courses(program)
-        
-        if not electives:
-            return []
-        
-        # Оцениваем каждый курс
-        recommendations = []
-        
-        for course in electives:
-            score, reasoning = self._score_course(course, user_skills, interests)
-            
-            recommendations.append(CourseRecommendation(
-                course=course,
-                score=score,
-                reasoning=reasoning,
-                priority=0  # Будет установлен после сортировки
-            ))
-        
-        # Сортируем по score
-        recommendations.sort(key=lambda x: x.score, reverse=True)
-        
-        # Устанавливаем приоритеты
-        for i, rec in enumerate(recommendations[:max_recommendations]):
-            rec.priority = i + 1
-        
-        return recommendations[:max_recommendations]
-    
-    def _score_course(
-        self,
-        course: Course,
-        user_skills: UserSkills,
-        interests: List[str]
-    ) -> tuple[float, str]:
-        """
-        Оценка релевантности курса для пользователя
-        
-        Returns:
-            (score, reasoning)
-        """
-        score = 0.0
-        reasons = []
-        
-        # 1. Совпадение с интересами (40% веса)
-        interest_score = 0.0
-        course_name_lower = course.name.lower()
-        course_desc_lower = course.description.lower()
-        
-        interest_matches = []
-        for interest in interests:
-            interest_lower = interest.lower()
-            if interest_lower in course_name_lower or interest_lower in course_desc_lower:
-                interest_score += 0.4
-                interest_matches.append(interest)
-                
-        if interest_matches:
-            reasons.append(f"Соответствует интересам: {', '.join(interest_matches)}")
-        
-        score += min(interest_score, 0.4)  # Максимум 0.4
-        
-        # 2. Соответствие уровню подготовки (30% веса)
-        readiness_score = self._check_prerequisites(course, user_skills)
-        score += readiness_score * 0.3
-        
-        if readiness_score > 0.7:
-            reasons.append("Хорошая база для этого курса")
-        elif readiness_score < 0.3:
-            reasons.append("Может потребоваться дополнительная подготовка")
-        
-        # 3. Польза для развития (20% веса)
-        growth_score = self._calculate_growth_potential(course, user_skills)
-        score += growth_score * 0.2
-        
-        if growth_score > 0.7:
-            reasons.append("Поможет освоить новые востребованные навыки")
-        
-        # 4. Карьерная ценность (10% веса)
-        career_score = self._calculate_career_value(course)
-        score += career_score * 0.1
-        
-        if career_score > 0.7:
-            reasons.append("Высокая востребованность на рынке")
-        
-        reasoning = "; ".join(reasons) if reasons else "Общий выборный курс"
-        
-        return score, reasoning
-    
-    def _check_prerequisites(self, course: Course, user_skills: UserSkills) -> float:
-        """Проверка готовности к курсу"""
-        if not course.prerequisites:
-            return 1.0
-            
-        met_prerequisites = 0
-        
-        for prereq in course.prerequisites:
-            prereq_lower = prereq.lower()
-            
-            if "python" in prereq_lower and user_skills.python.value in ["intermediate", "advanced"]:
-                met_prerequisites += 1
-            elif "машинн" in prereq_lower or "ml" in prereq_lower:
-                if user_skills.ml_basics.value in ["intermediate", "advanced"]:
-                    met_prerequisites += 1
-            elif "глубок" in prereq_lower or "deep" in prereq_lower:
-                if user_skills.deep_learning.value in ["intermediate", "advanced"]:
-                    met_prerequisites += 1
-            elif "статист" in prereq_lower or "вероятн" in prereq_lower:
-                if user_skills.statistics.value in ["intermediate", "advanced"]:
-                    met_prerequisites += 1
-            elif "алгебр" in prereq_lower or "math" in prereq_lower:
-                if user_skills.math.value in ["intermediate", "advanced"]:
-                    met_prerequisites += 1
-        
-        return met_prerequisites / len(course.prerequisites) if course.prerequisites else 1.0
-    
-    def _calculate_growth_potential(self, course: Course, user_skills: UserSkills) -> float:
-        """Оценка потенциала роста"""
-        # Чем меньше текущих навыков в области курса — тем выше потенциал роста
-        if not course.skills_gained:
-            return 0.5
-            
-        new_skills = 0
-        course_skills_text = " ".join(course.skills_gained).lower()
-        
-        # Проверяем, какие навыки курс даст
-        if "nlp" in course_skills_text or "text" in course_skills_text:
-            if user_skills.nlp.value in ["none", "beginner"]:
-                new_skills += 1
-                
-        if "cv" in course_skills_text or "vision" in course_skills_text or "image" in course_skills_text:
-            if user_skills.computer_vision.value in ["none", "beginner"]:
-                new_skills += 1
-                
-        if "pytorch" in course_skills_text or "нейрон" in course_skills_text:
-            if user_skills.deep_learning.value in ["none", "beginner"]:
-                new_skills += 1
-                
-        if "docker" in course_skills_text or "deploy" in course_skills_text:
-            if user_skills.mlops.value in ["none", "beginner"]:
-                new_skills += 1
-        
-        return min(new_skills / 2, 1.0)
-    
-    def _calculate_career_value(self, course: Course) -> float:
-        """Оценка карьерной ценности курса"""
-        high_value_keywords = [
-            "deep learning", "глубокое", "nlp", "computer vision",
-            "mlops", "transformer", "llm", "генеративн"
-        ]
-        
-        course_text = f"{course.name} {course.description}".lower()
-        
-        matches = sum(1 for kw in high_value_keywords if kw in course_text)
-        
-        return min(matches / 3, 1.0)
-    
-    def get_study_plan(
-        self,
-        recommendations: List[CourseRecommendation],
-        semesters: int = 4
-    ) -> Dict[int, List[Course]]:
-        """
-        Составление плана обучения по семестрам
-        
-        Args:
-            recommendations: Рекомендованные курсы
-            semesters: Количество семестров
-            
-        Returns:
-            Словарь {семестр: [курсы]}
-        """
-        plan = {i: [] for i in range(1, semesters + 1)}
-        
-        for rec in recommendations:
-            semester = rec.course.semester
-            if semester <= semesters:
-                plan[semester].append(rec.course)
-        
-        return plan
-    
-    def format_recommendations(
-        self,
-        recommendations: List[CourseRecommendation],
-        include_plan: bool = True
-    ) -> str:
-        """Форматирование рекомендаций в текст"""
-        if not recommendations:
-            return "К сожалению, не удалось подобрать рекомендации. Попробуйте уточнить ваши интересы."
-        
-        lines = ["🎯 **Рекомендованные курсы:**\n"]
-        
-        for rec in recommendations:
-            emoji = ["🥇", "🥈", "🥉", "4️⃣", "5️⃣"][rec.priority - 1] if rec.priority <= 5 else "▪️"
-            
-            lines.append(f"{emoji} **{rec.course.name}**")
-            lines.append(f"   📍 Программа: {rec.course.program}")
-            lines.append(f"   📅 Семестр: {rec.course.semester}")
-            lines.append(f"   💡 {rec.reasoning}")
-            lines.append(f"   📊 Оценка соответствия: {rec.score:.0%}")
-            lines.append("")
-        
-        if include_plan:
-            plan = self.get_study_plan(recommendations)
-            
-            lines.append("\n📚 **План изучения по семестрам:**\n")
-            for semester, courses in plan.items():
-                if courses:
-                    lines.append(f"**Семестр {semester}:**")
-                    for course in courses:
-                        lines.append(f"  • {course.name}")
-                    lines.append("")
-        
-        return "\n".join(lines)
-    
-    async def get_llm_recommendations(
-        self,
-        user_background: str,
-        interests: List[str],
-        available_courses: List[Course]
-    ) -> str:
-        """
-        Получение рекомендаций через LLM для более персонализированного ответа
-        """
-        courses_text = "\n".join([
-            f"- {c.name} (семестр {c.semester}, {c.course_type}): {c.description}"
-            for c in available_courses
-        ])
-        
-        prompt = f"""
-        Пользователь хочет получить рекомендации по выбору курсов.
-        
-        Бэкграунд пользователя: {user_background}
-        Интересы: {', '.join(interests)}
-        
-        Доступные выборные курсы:
-        {courses_text}
-        
-        Дай персонализированные рекомендации:
-        1. Какие 3-5 курсов лучше всего подойдут этому студенту?
-        2. В каком порядке их лучше изучать?
-        3. Какие навыки поможет развить каждый курс?
-        4. Как это поможет в карьере?
-        
-        Учитывай уровень подготовки студента.
-        """
-        
-        response = self.client.chat.completions.create(
-            model=settings.LLM_MODEL,
-            messages=[
-                {"role": "system", "content": "Ты — консультант по образовательным программам в области AI."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.4,
-            max_tokens=1500
-        )
-        
-        return response.choices[0].message.content
\ No newline at end of file
+"""
+Рекомендательная система для выбора курсов
+"""
+from typing import Any, Callable, Iterator, List, Dict, FrozenSet, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from enum import IntEnum
+from functools import lru_cache, partial
+import hashlib
+import heapq
+import logging
+import mmap
+import os
+import re
+import threading
+
+import ahocorasick
+import ijson
+import numpy as np
+import orjson
+from diskcache import Cache
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Файлы каталога курсов в DATA_DIR
+COURSE_FILES = ["ai_program.json", "ai_product_program.json"]
+
+# Файлы каталога крупнее этого размера разбираются потоково через ijson
+STREAMING_THRESHOLD_BYTES = 8 * 1024 * 1024
+
+# Маркеры первых мест в списке рекомендаций; остальные — PRIORITY_EMOJI_DEFAULT
+PRIORITY_EMOJIS = ("🥇", "🥈", "🥉", "4️⃣", "5️⃣")
+PRIORITY_EMOJI_DEFAULT = "▪️"
+
+# Сколько семестров охватывает план изучения
+STUDY_PLAN_SEMESTERS = 4
+
+# Сколько результатов recommend_courses держать в памяти
+RECOMMENDATIONS_CACHE_SIZE = 1024
+
+# Сколько интересов держать в обратном индексе интерес -> курсы
+INTEREST_INDEX_SIZE = 4096
+
+# Сколько списков интересов держать с готовым сопоставлением курс -> интересы
+INTEREST_MATCHES_CACHE_SIZE = 1024
+
+# Оценки готовности и роста зависят только от маски навыков (2^8 вариантов)
+SKILL_SCORES_CACHE_SIZE = 256
+
+# Доля веса интересов, которую может дать только смысловая близость курса
+SEMANTIC_INTEREST_SHARE = 0.5
+
+# Косинусная близость интересов к курсу, ниже которой тематика считается
+# несвязанной; у каждого бэкенда эмбеддингов свой диапазон косинусов
+SEMANTIC_SIMILARITY_THRESHOLDS = {"openai": 0.3, "onnx": 0.8}
+SEMANTIC_SIMILARITY_THRESHOLD_DEFAULT = 0.8
+
+# Срок хранения персональных рекомендаций LLM в дисковом кэше
+LLM_RECOMMENDATIONS_TTL_SECONDS = 24 * 3600
+
+# Параметры генерации персональных рекомендаций
+LLM_RECOMMENDATIONS_TEMPERATURE = 0.4
+LLM_RECOMMENDATIONS_MAX_TOKENS = 1500
+
+
+class SkillLevel(IntEnum):
+    """Уровни владения навыками; сравниваются как числа"""
+    NONE = 0
+    BEGINNER = 1
+    INTERMEDIATE = 2
+    ADVANCED = 3
+
+
+# Подстроки бэкграунда и уровни навыков, которые они означают
+_BACKGROUND_RULES = [
+    # Python
+    (["python", "питон", "программирован"], [("python", SkillLevel.INTERMEDIATE)]),
+    (["senior", "lead"], [("python", SkillLevel.ADVANCED)]),
+    # Математика
+    (["математик", "math", "физик", "мехмат"],
+     [("math", SkillLevel.ADVANCED), ("statistics", SkillLevel.INTERMEDIATE)]),
+    # ML
+    (["ml", "machine learning", "машинн"], [("ml_basics", SkillLevel.INTERMEDIATE)]),
+    (["data scien", "ds", "аналитик данных"],
+     [("ml_basics", SkillLevel.INTERMEDIATE), ("statistics", SkillLevel.INTERMEDIATE)]),
+    # Deep Learning
+    (["deep learning", "нейронн", "pytorch", "tensorflow"],
+     [("deep_learning", SkillLevel.INTERMEDIATE)]),
+    # NLP
+    (["nlp", "нлп", "обработка текст", "natural language"], [("nlp", SkillLevel.INTERMEDIATE)]),
+    # CV
+    (["computer vision", "cv", "компьютерн зрен", "opencv"],
+     [("computer_vision", SkillLevel.INTERMEDIATE)]),
+    # MLOps
+    (["mlops", "devops", "docker", "kubernetes", "deploy"], [("mlops", SkillLevel.INTERMEDIATE)]),
+]
+
+
+def _build_background_automaton() -> ahocorasick.Automaton:
+    """Автомат Ахо-Корасик по всем ключевым словам бэкграунда"""
+    payloads: Dict[str, List[Tuple[str, SkillLevel]]] = {}
+    for words, assignments in _BACKGROUND_RULES:
+        for word in words:
+            payloads.setdefault(word, []).extend(assignments)
+    
+    automaton = ahocorasick.Automaton()
+    for word, assignments in payloads.items():
+        automaton.add_word(word, tuple(assignments))
+    automaton.make_automaton()
+    return automaton
+
+
+_BACKGROUND_AUTOMATON = _build_background_automaton()
+
+# Темы пререквизитов одним проходом: имя группы — категория темы
+PREREQ_PATTERN = re.compile(
+    r"(?P<python>python)|(?P<ml>машинн|ml)|(?P<dl>глубок|deep)"
+    r"|(?P<stats>статист|вероятн)|(?P<math>алгебр|math)"
+)
+
+# Навык, закрывающий категорию; порядок — приоритет при нескольких совпадениях
+CATEGORY_TO_ATTR = {
+    "python": "python",
+    "ml": "ml_basics",
+    "dl": "deep_learning",
+    "stats": "statistics",
+    "math": "math",
+}
+
+# Подстроки навыков курса и области, в которых курс даёт новое
+_GROWTH_RULES = [
+    (("nlp", "text"), "nlp"),
+    (("cv", "vision", "image"), "computer_vision"),
+    (("pytorch", "нейрон"), "deep_learning"),
+    (("docker", "deploy"), "mlops"),
+]
+
+# Востребованные на рынке темы; ни одна не является подстрокой другой
+HIGH_VALUE_KEYWORDS = (
+    "deep learning", "глубокое", "nlp", "computer vision",
+    "mlops", "transformer", "llm", "генеративн"
+)
+_HIGH_VALUE_PATTERN = re.compile("|".join(map(re.escape, HIGH_VALUE_KEYWORDS)))
+
+
+def _prerequisite_skills(prereq: str) -> Tuple[str, ...]:
+    """
+    Навыки, любой из которых закрывает пререквизит
+    
+    Python проверяется первым; если его уровня не хватает, пререквизит
+    ещё может закрыть первая по приоритету из остальных найденных тем.
+    """
+    categories = {match.lastgroup for match in PREREQ_PATTERN.finditer(prereq.lower())}
+    skills = ["python"] if "python" in categories else []
+    for category, attr in CATEGORY_TO_ATTR.items():
+        if category != "python" and category in categories:
+            skills.append(attr)
+            break
+    return tuple(skills)
+
+
+@dataclass(slots=True)
+class UserSkills:
+    """Навыки пользователя"""
+    python: SkillLevel = SkillLevel.NONE
+    math: SkillLevel = SkillLevel.NONE
+    statistics: SkillLevel = SkillLevel.NONE
+    ml_basics: SkillLevel = SkillLevel.NONE
+    deep_learning: SkillLevel = SkillLevel.NONE
+    nlp: SkillLevel = SkillLevel.NONE
+    computer_vision: SkillLevel = SkillLevel.NONE
+    mlops: SkillLevel = SkillLevel.NONE
+    
+    @classmethod
+    def from_background(cls, background: str) -> "UserSkills":
+        """Создание профиля навыков из текстового описания"""
+        # Простая эвристика — в реальности можно использовать LLM
+        background_lower = background.lower()
+        
+        skills = cls()
+        
+        # Один проход автомата по тексту; из нескольких совпадений побеждает высший уровень
+        for _, assignments in _BACKGROUND_AUTOMATON.iter(background_lower):
+            for attr, level in assignments:
+                if level > getattr(skills, attr):
+                    setattr(skills, attr, level)
+        
+        return skills
+    
+    def mask(self, min_level: SkillLevel) -> int:
+        """Битовая маска навыков с уровнем не ниже min_level"""
+        result = 0
+        for attr, bit in _SKILL_BITS.items():
+            if getattr(self, attr) >= min_level:
+                result |= bit
+        return result
+
+
+# Бит каждого навыка в масках пользователя и курса
+_SKILL_BITS = {f.name: 1 << i for i, f in enumerate(fields(UserSkills))}
+
+# Уровень, достаточный для пререквизита; навыки ниже него курс даёт как новые
+_READY_LEVEL = SkillLevel.INTERMEDIATE
+_ALL_SKILLS_MASK = (1 << len(_SKILL_BITS)) - 1
+
+
+def _skills_mask(attrs) -> int:
+    """Битовая маска набора навыков"""
+    result = 0
+    for attr in attrs:
+        result |= _SKILL_BITS[attr]
+    return result
+
+
+@dataclass(slots=True)
+class Course:
+    """Информация о курсе"""
+    name: str
+    program: str
+    semester: int
+    course_type: str
+    credits: int
+    description: str = ""
+    prerequisites: List[str] = field(default_factory=list)
+    skills_gained: List[str] = field(default_factory=list)
+    difficulty: str = "medium"
+    
+    # Признаки для оценки, не зависящие от пользователя; считаются один раз
+    name_lower: str = field(default="", init=False, repr=False)
+    description_lower: str = field(default="", init=False, repr=False)
+    program_lower: str = field(default="", init=False, repr=False)
+    prerequisite_masks: Tuple[int, ...] = field(default=(), init=False, repr=False)
+    growth_mask: int = field(default=0, init=False, repr=False)
+    career_value: float = field(default=0.0, init=False, repr=False)
+    
+    def __post_init__(self):
+        # В JSON каталога поле может быть явным null
+        if self.description is None:
+            self.description = ''
+        if self.prerequisites is None:
+            self.prerequisites = []
+        if self.skills_gained is None:
+            self.skills_gained = []
+        
+        self.name_lower = self.name.lower()
+        self.description_lower = self.description.lower()
+        self.program_lower = self.program.lower()
+        
+        self.prerequisite_masks = tuple(
+            _skills_mask(_prerequisite_skills(p)) for p in self.prerequisites
+        )
+        
+        skills_text = " ".join(self.skills_gained).lower()
+        self.growth_mask = _skills_mask(
+            attr for words, attr in _GROWTH_RULES
+            if any(word in skills_text for word in words)
+        )
+        
+        course_text = f"{self.name_lower} {self.description_lower}"
+        matches = set(_HIGH_VALUE_PATTERN.findall(course_text))
+        self.career_value = min(len(matches) / 3, 1.0)
+
+
+@dataclass(slots=True)
+class CourseRecommendation:
+    """Рекомендация курса"""
+    course: Course
+    score: float
+    reasoning: str
+    priority: int  # 1 = высший приоритет
+
+
+@dataclass(slots=True)
+class _CourseCatalog:
+    """
+    Каталог курсов вместе со всем, что вычислено по позициям в нём
+    
+    При перечитывании файлов заменяется целиком, поэтому запрос, взявший
+    каталог в начале, до конца работает с согласованными данными.
+    """
+    courses: List[Course]
+    # Обратный индекс интерес -> позиции курсов и совпадения по списку интересов
+    interest_courses: Callable[[str], FrozenSet[int]]
+    interest_matches: Callable[[Tuple[str, ...]], Dict[int, Tuple[str, ...]]]
+    # Готовность и потенциал роста по всем курсам для каждой маски навыков
+    skill_scores: Callable[[int], Tuple[Tuple[float, float], ...]]
+    # Нормированные эмбеддинги курсов (строка — позиция в courses), считаются один раз
+    embeddings: Optional[np.ndarray] = None
+    embeddings_lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class CourseRecommender:
+    """Рекомендательная система для курсов"""
+    
+    # Каталог общий для всех экземпляров; ключ — время изменения файлов
+    _courses_cache: Optional[List[Course]] = None
+    _courses_key: Optional[Tuple[Optional[float], ...]] = None
+    _courses_lock = threading.Lock()
+    
+    def __init__(
+        self,
+        embedder: Optional[Any] = None,
+        llm: Optional[Any] = None,
+        llm_cache: Optional[Cache] = None
+    ):
+        """
+        Args:
+            embedder: Источник эмбеддингов с методами embed_documents и
+                embed_queries (например, VectorStore); без него курсы
+                оцениваются только эвристиками
+            llm: Общий LLMClient (например, RAGRetriever.llm), чтобы все запросы
+                процесса делили одно ограничение; без него создаётся свой
+            llm_cache: Дисковый кэш ответов LLM (например, RAGRetriever.llm_cache);
+                без него открывается settings.LLM_CACHE_DIRNAME в DATA_DIR
+        """
+        self.embedder = embedder
+        
+        if llm is None:
+            # Импорт здесь: пакет rag сам импортирует рекомендательную систему
+            from openai import AsyncOpenAI
+            from rag.llm_client import LLM_MAX_RETRIES, LLM_TIMEOUT, LLMClient
+            
+            aclient = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                timeout=LLM_TIMEOUT,
+                max_retries=LLM_MAX_RETRIES
+            )
+            llm = LLMClient(aclient, max_concurrency=settings.LLM_MAX_CONCURRENCY)
+        # Одновременные запросы разных пользователей объединяются в пачки,
+        # одинаковые промпты выполняются один раз
+        self.llm = llm
+        
+        if llm_cache is None:
+            llm_cache = Cache(os.path.join(settings.DATA_DIR, settings.LLM_CACHE_DIRNAME))
+        self.llm_cache = llm_cache
+        
+        # Каталог с производными кэшами; заменяется при изменении файлов
+        self._catalog = self._build_catalog(self._get_courses())
+        self._catalog_lock = threading.Lock()
+        
+        self._semantic_threshold = SEMANTIC_SIMILARITY_THRESHOLDS.get(
+            settings.EMBEDDING_BACKEND, SEMANTIC_SIMILARITY_THRESHOLD_DEFAULT
+        )
+        
+        # Готовые рекомендации по отпечатку нормализованных входных данных;
+        # recommend_courses вызывается из потоков, поэтому доступ под блокировкой
+        self._recommendations_cache: "OrderedDict[str, Tuple[CourseRecommendation, ...]]" = OrderedDict()
+        self._recommendations_lock = threading.Lock()
+    
+    @property
+    def courses(self) -> List[Course]:
+        """Текущий каталог курсов"""
+        return self._catalog.courses
+    
+    def warmup(self):
+        """Прогрев: эмбеддинги курсов до первого запроса рекомендаций"""
+        catalog = self._current_catalog()
+        if self.embedder is not None:
+            self._get_course_embeddings(catalog)
+    
+    def _build_catalog(self, courses: List[Course]) -> _CourseCatalog:
+        """Каталог с пустыми производными кэшами, привязанными к этому списку курсов"""
+        interest_courses = lru_cache(maxsize=INTEREST_INDEX_SIZE)(
+            partial(self._find_interest_courses, courses)
+        )
+        return _CourseCatalog(
+            courses=courses,
+            interest_courses=interest_courses,
+            interest_matches=lru_cache(maxsize=INTEREST_MATCHES_CACHE_SIZE)(
+                partial(self._match_interests, interest_courses)
+            ),
+            skill_scores=lru_cache(maxsize=SKILL_SCORES_CACHE_SIZE)(
+                partial(self._compute_skill_scores, courses)
+            )
+        )
+    
+    def _current_catalog(self) -> _CourseCatalog:
+        """
+        Каталог для очередного запроса; при изменении файлов курсов
+        собирается новый, а готовые рекомендации сбрасываются
+        """
+        courses = self._get_courses()
+        catalog = self._catalog
+        if catalog.courses is courses:
+            return catalog
+        
+        with self._catalog_lock:
+            if self._catalog.courses is not courses:
+                # Сначала замена, затем очистка: вставка в кэш рекомендаций
+                # проверяет текущий каталог под той же блокировкой
+                self._catalog = self._build_catalog(courses)
+                with self._recommendations_lock:
+                    self._recommendations_cache.clear()
+                logger.info(f"Course catalog reloaded: {len(courses)} courses")
+            return self._catalog
+    
+    def _get_course_embeddings(self, catalog: _CourseCatalog) -> np.ndarray:
+        """Нормированные эмбеддинги всех курсов каталога одной пачкой"""
+        with catalog.embeddings_lock:
+            if catalog.embeddings is None:
+                texts = [f"{c.name}. {c.description}" for c in catalog.courses]
+                matrix = np.asarray(self.embedder.embed_documents(texts), dtype=np.float32)
+                matrix /= np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-9, None)
+                catalog.embeddings = matrix
+            return catalog.embeddings
+    
+    def _semantic_scores(
+        self,
+        catalog: _CourseCatalog,
+        interests: List[str],
+        positions: List[int]
+    ) -> np.ndarray:
+        """
+        Смысловая близость курсов к интересам в [0, 1]
+        
+        Учитывается только превышение порога бэкенда эмбеддингов: курсы
+        ниже порога получают 0, даже если ближе к интересам ничего нет.
+        """
+        queries = np.asarray(self.embedder.embed_queries(interests), dtype=np.float32)
+        queries /= np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-9, None)
+        
+        similarity = (queries @ self._get_course_embeddings(catalog)[positions].T).mean(axis=0)
+        threshold = self._semantic_threshold
+        return np.clip((similarity - threshold) / (1.0 - threshold), 0.0, 1.0)
+    
+    @classmethod
+    def _get_courses(cls) -> List[Course]:
+        """Каталог курсов из кэша; перечитывается, если файлы изменились"""
+        key = cls._files_key()
+        with cls._courses_lock:
+            if cls._courses_cache is None or cls._courses_key != key:
+                cls._courses_cache = cls._load_courses()
+                cls._courses_key = key
+            return cls._courses_cache
+    
+    @classmethod
+    def reload_courses(cls) -> List[Course]:
+        """
+        Принудительное перечитывание каталога курсов
+        
+        Существующие экземпляры переходят на новый каталог при следующем запросе.
+        """
+        with cls._courses_lock:
+            cls._courses_cache = None
+        return cls._get_courses()
+    
+    @staticmethod
+    def _files_key() -> Tuple[Optional[float], ...]:
+        """Время изменения файлов каталога (None для отсутствующих)"""
+        key = []
+        for filename in COURSE_FILES:
+            try:
+                key.append(os.path.getmtime(f"{settings.DATA_DIR}/{filename}"))
+            except OSError:
+                key.append(None)
+        return tuple(key)
+    
+    @classmethod
+    def _load_courses(cls) -> List[Course]:
+        """Загрузка курсов из JSON файлов"""
+        # Файлы читаются параллельно: при холодном кэше ОС их чтение перекрывается
+        with ThreadPoolExecutor(max_workers=len(COURSE_FILES)) as executor:
+            courses = [
+                course
+                for file_courses in executor.map(cls._load_one_file, COURSE_FILES)
+                for course in file_courses
+            ]
+        
+        # Добавляем дефолтные курсы, если файлы не найдены
+        if not courses:
+            courses = cls._get_default_courses()
+            
+        return courses
+    
+    @classmethod
+    def _load_one_file(cls, filename: str) -> List[Course]:
+        """Курсы одного файла программы; пустой список, если файл не прочитан"""
+        filepath = f"{settings.DATA_DIR}/{filename}"
+        try:
+            return [
+                Course(
+                    name=course_data['name'],
+                    program=program_name,
+                    semester=course_data.get('semester', 1),
+                    course_type=course_data.get('course_type', 'обязательная'),
+                    credits=course_data.get('credits', 3),
+                    description=course_data.get('description') or '',
+                    prerequisites=course_data.get('prerequisites', []),
+                    skills_gained=course_data.get('skills', [])
+                )
+                for program_name, course_data in cls._iter_course_records(filepath)
+            ]
+        except FileNotFoundError:
+            logger.warning(f"File not found: {filepath}")
+        except (orjson.JSONDecodeError, ijson.JSONError):
+            logger.error(f"Invalid JSON in {filepath}")
+        return []
+    
+    @staticmethod
+    def _iter_course_records(filepath: str) -> Iterator[Tuple[str, Dict]]:
+        """Пары (название программы, данные курса) из JSON файла программы"""
+        size = os.path.getsize(filepath)
+        if size > STREAMING_THRESHOLD_BYTES:
+            # Большой файл не материализуется целиком: сначала название
+            # программы, затем курсы по одному
+            with open(filepath, 'rb') as f:
+                program_name = next(ijson.items(f, 'name'), 'Unknown')
+                f.seek(0)
+                for course_data in ijson.items(f, 'courses.item', use_float=True):
+                    yield program_name, course_data
+            return
+        
+        # Пустой файл нельзя отобразить в память, а JSON в нём всё равно нет
+        if size == 0:
+            raise orjson.JSONDecodeError("Empty file", "", 0)
+        
+        # orjson разбирает отображённые в память байты напрямую: без копии
+        # в bytes и без отдельного декодирования UTF-8
+        with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                data = orjson.loads(view)
+        program_name = data.get('name', 'Unknown')
+        for course_data in data.get('courses', []):
+            yield program_name, course_data
+    
+    @staticmethod
+    def _get_default_courses() -> List[Course]:
+        """Дефолтный список курсов"""
+        return [
+            # AI Program - Обязательные
+            Course("Машинное обучение", "AI", 1, "обязательная", 4,
+                   "Основы ML: регрессия, классификация, кластеризация",
+                   prerequisites=["Python", "Линейная алгебра"],
+                   skills_gained=["sklearn", "pandas", "ML pipelines"]),
+            
+            Course("Глубокое обучение", "AI", 2, "обязательная", 4,
+                   "Нейронные сети, CNN, RNN, Transformers",
+                   prerequisites=["Машинное обучение"],
+                   skills_gained=["PyTorch", "Нейронные сети"]),
+            
+            Course("Математическая статистика", "AI", 1, "обязательная", 3,
+                   "Статистические методы для ML",
+                   prerequisites=["Теория вероятностей"],
+                   skills_gained=["Статистический анализ", "A/B тесты"]),
+            
+            Course("MLOps", "AI", 3, "обязательная", 3,
+                   "Развёртывание и мониторинг ML-систем",
+                   prerequisites=["Машинное обучение", "Docker"],
+                   skills_gained=["Docker", "CI/CD", "Model serving"]),
+            
+            # AI Program - Выборные
+            Course("Компьютерное зрение", "AI", 2, "выборная", 3,
+                   "Обработка изображений, детекция, сегментация",
+                   prerequisites=["Глубокое обучение"],
+                   skills_gained=["OpenCV", "CNN", "Object Detection"],
+                   difficulty="high"),
+            
+            Course("Обработка естественного языка", "AI", 2, "выборная", 3,
+                   "NLP: токенизация, эмбеддинги, трансформеры",
+                   prerequisites=["Глубокое обучение"],
+                   skills_gained=["Transformers", "BERT", "Text processing"],
+                   difficulty="high"),
+            
+            Course("Reinforcement Learning", "AI", 3, "выборная", 3,
+                   "Обучение с подкреплением",
+                   prerequisites=["Глубокое обучение", "Теория вероятностей"],
+                   skills_gained=["RL algorithms", "Gym", "Policy optimization"],
+                   difficulty="high"),
+            
+            Course("Генеративные модели", "AI", 3, "выборная", 3,
+                   "VAE, GAN, Diffusion models",
+                   prerequisites=["Глубокое обучение"],
+                   skills_gained=["GANs", "Diffusion", "Image generation"],
+                   difficulty="high"),
+            
+            Course("Big Data", "AI", 2, "выборная", 3,
+                   "Spark, распределённые вычисления",
+                   prerequisites=["Python", "SQL"],
+                   skills_gained=["Spark", "Hadoop", "Distributed computing"]),
+            
+            # AI Product - Специфичные
+            Course("Управление AI-продуктом", "AI Product", 1, "обязательная", 3,
+                   "Product management для AI-продуктов",
+                   prerequisites=[],
+                   skills_gained=["Product thinking", "Roadmap", "Metrics"]),
+            
+            Course("Дизайн AI-систем", "AI Product", 2, "обязательная", 3,
+                   "Проектирование архитектуры ML-систем",
+                   prerequisites=["Машинное обучение"],
+                   skills_gained=["System design", "ML architecture"]),
+            
+            Course("AI Ethics", "AI Product", 2, "выборная", 2,
+                   "Этика искусственного интеллекта",
+                   prerequisites=[],
+                   skills_gained=["AI Ethics", "Responsible AI", "Bias detection"]),
+        ]
+    
+    def get_elective_courses(self, program: Optional[str] = None) -> List[Course]:
+        """Получение списка выборных курсов"""
+        return [course for _, course in self._electives(self._current_catalog(), program)]
+    
+    def _electives(
+        self,
+        catalog: _CourseCatalog,
+        program: Optional[str] = None
+    ) -> List[Tuple[int, Course]]:
+        """Выборные курсы вместе с их позициями в каталоге"""
+        courses = [(i, c) for i, c in enumerate(catalog.courses) if c.course_type == "выборная"]
+        
+        if program:
+            program_lower = program.lower()
+            courses = [(i, c) for i, c in courses if program_lower in c.program_lower]
+            
+        return courses
+    
+    @staticmethod
+    def _find_interest_courses(courses: List[Course], interest_lower: str) -> FrozenSet[int]:
+        """Позиции курсов, в названии или описании которых встречается интерес"""
+        return frozenset(
+            i for i, course in enumerate(courses)
+            if interest_lower in course.name_lower or interest_lower in course.description_lower
+        )
+    
+    @staticmethod
+    def _match_interests(
+        interest_courses: Callable[[str], FrozenSet[int]],
+        interests: Tuple[str, ...]
+    ) -> Dict[int, Tuple[str, ...]]:
+        """
+        Совпавшие интересы по позициям курсов для конкретного списка интересов
+        
+        Результат кэшируется по списку целиком: в диалоге один и тот же
+        профиль запрашивает рекомендации многократно.
+        """
+        matches: Dict[int, List[str]] = {}
+        for interest in interests:
+            for position in interest_courses(interest.lower()):
+                matches.setdefault(position, []).append(interest)
+        return {position: tuple(found) for position, found in matches.items()}
+    
+    def recommend_courses(
+        self,
+        user_background: str,
+        interests: List[str],
+        program: Optional[str] = None,
+        max_recommendations: int = 5
+    ) -> List[CourseRecommendation]:
+        """
+        Рекомендация курсов на основе профиля пользователя
+        
+        Args:
+            user_background: Текстовое описание бэкграунда
+            interests: Список интересов
+            program: Фильтр по программе (опционально)
+            max_recommendations: Максимум рекомендаций
+            
+        Returns:
+            Список рекомендаций с оценками
+        """
+        # Весь расчёт идёт по одному каталогу, даже если его заменят посреди запроса
+        catalog = self._current_catalog()
+        
+        # Повторные запросы с тем же профилем не пересчитывают оценки
+        cache_key = self._recommendations_key(
+            user_background, interests, program, max_recommendations
+        )
+        with self._recommendations_lock:
+            cached = self._recommendations_cache.get(cache_key)
+            if cached is not None:
+                self._recommendations_cache.move_to_end(cache_key)
+                return list(cached)
+        
+        # Анализируем навыки пользователя
+        user_skills = UserSkills.from_background(user_background)
+        
+        # Получаем выборные курсы
+        electives = self._electives(catalog, program)
+        
+        if not electives:
+            return []
+        
+        # Совпадения интересов со всеми курсами — одним поиском на список интересов
+        interest_matches_by_position = catalog.interest_matches(tuple(interests))
+        
+        # Смысловая близость дополняет поиск интересов по подстроке; при
+        # ошибке API оценка эвристическая и в кэш не попадает
+        semantic = np.zeros(len(electives), dtype=np.float32)
+        cacheable = True
+        if self.embedder is not None and interests:
+            try:
+                semantic = self._semantic_scores(catalog, interests, [i for i, _ in electives])
+            except Exception as e:
+                logger.error(f"Error computing semantic course scores: {e}")
+                cacheable = False
+        
+        # Часть оценки, зависящая от навыков, общая для одинаковых профилей
+        skill_scores = catalog.skill_scores(user_skills.mask(_READY_LEVEL))
+        
+        # Оцениваем каждый курс
+        recommendations = []
+        
+        for (position, course), semantic_score in zip(electives, semantic.tolist()):
+            interest_matches = interest_matches_by_position.get(position, ())
+            readiness_score, growth_score = skill_scores[position]
+            score, reasoning = self._score_course(
+                course, readiness_score, growth_score, interest_matches, semantic_score
+            )
+            
+            recommendations.append(CourseRecommendation(
+                course=course,
+                score=score,
+                reasoning=reasoning,
+                priority=0  # Будет установлен после сортировки
+            ))
+        
+        # Лучшие по score без полной сортировки; при равенстве порядок как у sort
+        top = heapq.nlargest(max_recommendations, recommendations, key=lambda x: x.score)
+        
+        # Устанавливаем приоритеты
+        for i, rec in enumerate(top):
+            rec.priority = i + 1
+        
+        if cacheable:
+            with self._recommendations_lock:
+                # Результат по устаревшему каталогу в очищенный кэш не попадает
+                if self._catalog is catalog:
+                    self._recommendations_cache[cache_key] = tuple(top)
+                    while len(self._recommendations_cache) > RECOMMENDATIONS_CACHE_SIZE:
+                        self._recommendations_cache.popitem(last=False)
+        
+        return top
+    
+    @staticmethod
+    def _recommendations_key(
+        user_background: str,
+        interests: List[str],
+        program: Optional[str],
+        max_recommendations: int
+    ) -> str:
+        """
+        Отпечаток входных данных recommend_courses
+        
+        Бэкграунд разбирается без учёта регистра, поэтому приводится к нижнему;
+        интересы попадают в текст обоснования как есть и остаются без изменений.
+        """
+        interests_key = "\x1f".join(interests)
+        raw = f"{user_background.lower()}|{interests_key}|{program or ''}|{max_recommendations}"
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def _score_course(
+        self,
+        course: Course,
+        readiness_score: float,
+        growth_score: float,
+        interest_matches: Tuple[str, ...],
+        semantic_score: float = 0.0
+    ) -> tuple[float, str]:
+        """
+        Оценка релевантности курса для пользователя
+        
+        readiness_score и growth_score — готовность и потенциал роста из
+        _compute_skill_scores; interest_matches — интересы пользователя, найденные в тексте курса;
+        semantic_score — смысловая близость курса к интересам сверх порога бэкенда.
+        
+        Returns:
+            (score, reasoning)
+        """
+        score = 0.0
+        reasons = []
+        
+        # 1. Совпадение с интересами (40% веса)
+        interest_score = 0.4 * max(len(interest_matches), SEMANTIC_INTEREST_SHARE * semantic_score)
+        
+        if interest_matches:
+            reasons.append(f"Соответствует интересам: {', '.join(interest_matches)}")
+        elif semantic_score > 0:
+            # Ненулевая оценка — близость выше порога бэкенда эмбеддингов
+            reasons.append("Близок к интересам по тематике")
+        
+        score += min(interest_score, 0.4)  # Максимум 0.4
+        
+        # 2. Соответствие уровню подготовки (30% веса)
+        score += readiness_score * 0.3
+        
+        if readiness_score > 0.7:
+            reasons.append("Хорошая база для этого курса")
+        elif readiness_score < 0.3:
+            reasons.append("Может потребоваться дополнительная подготовка")
+        
+        # 3. Польза для развития (20% веса)
+        score += growth_score * 0.2
+        
+        if growth_score > 0.7:
+            reasons.append("Поможет освоить новые востребованные навыки")
+        
+        # 4. Карьерная ценность (10% веса)
+        career_score = self._calculate_career_value(course)
+        score += career_score * 0.1
+        
+        if career_score > 0.7:
+            reasons.append("Высокая востребованность на рынке")
+        
+        reasoning = "; ".join(reasons) if reasons else "Общий выборный курс"
+        
+        return score, reasoning
+    
+    def _compute_skill_scores(
+        self,
+        courses: List[Course],
+        ready_mask: int
+    ) -> Tuple[Tuple[float, float], ...]:
+        """(готовность, потенциал роста) для каждого курса по позиции в courses"""
+        novice_mask = _ALL_SKILLS_MASK & ~ready_mask
+        return tuple(
+            (self._check_prerequisites(course, ready_mask),
+             self._calculate_growth_potential(course, novice_mask))
+            for course in courses
+        )
+    
+    def _check_prerequisites(self, course: Course, ready_mask: int) -> float:
+        """Проверка готовности к курсу"""
+        if not course.prerequisites:
+            return 1.0
+        
+        # Пререквизит закрыт, если пользователь готов хотя бы по одному его навыку
+        met_prerequisites = sum(1 for mask in course.prerequisite_masks if mask & ready_mask)
+        
+        return met_prerequisites / len(course.prerequisites)
+    
+    def _calculate_growth_potential(self, course: Course, novice_mask: int) -> float:
+        """Оценка потенциала роста"""
+        # Чем меньше текущих навыков в области курса — тем выше потенциал роста
+        if not course.skills_gained:
+            return 0.5
+            
+        new_skills = (course.growth_mask & novice_mask).bit_count()
+        
+        return min(new_skills / 2, 1.0)
+    
+    def _calculate_career_value(self, course: Course) -> float:
+        """Оценка карьерной ценности курса"""
+        return course.career_value
+    
+    def get_study_plan(
+        self,
+        recommendations: List[CourseRecommendation],
+        semesters: int = STUDY_PLAN_SEMESTERS
+    ) -> Dict[int, List[Course]]:
+        """
+        Составление плана обучения по семестрам
+        
+        Args:
+            recommendations: Рекомендованные курсы
+            semesters: Количество семестров
+            
+        Returns:
+            Словарь {семестр: [курсы]}
+        """
+        plan = {i: [] for i in range(1, semesters + 1)}
+        
+        for rec in recommendations:
+            semester = rec.course.semester
+            if semester <= semesters:
+                plan[semester].append(rec.course)
+        
+        return plan
+    
+    def format_recommendations(
+        self,
+        recommendations: List[CourseRecommendation],
+        include_plan: bool = True
+    ) -> str:
+        """Форматирование рекомендаций в текст"""
+        if not recommendations:
+            return "К сожалению, не удалось подобрать рекомендации. Попробуйте уточнить ваши интересы."
+        
+        lines = ["🎯 **Рекомендованные курсы:**\n"]
+        
+        # План по семестрам собирается в том же проходе, что и карточки
+        plan: Dict[int, List[Course]] = {i: [] for i in range(1, STUDY_PLAN_SEMESTERS + 1)}
+        
+        for rec in recommendations:
+            if include_plan and rec.course.semester in plan:
+                plan[rec.course.semester].append(rec.course)
+            
+            emoji = (
+                PRIORITY_EMOJIS[rec.priority - 1]
+                if rec.priority <= len(PRIORITY_EMOJIS) else PRIORITY_EMOJI_DEFAULT
+            )
+            
+            # Карточка курса одной строкой с завершающим переводом строки:
+            # join добавит пустую строку-разделитель перед следующей
+            lines.append(
+                f"{emoji} **{rec.course.name}**\n"
+                f"   📍 Программа: {rec.course.program}\n"
+                f"   📅 Семестр: {rec.course.semester}\n"
+                f"   💡 {rec.reasoning}\n"
+                f"   📊 Оценка соответствия: {rec.score:.0%}\n"
+            )
+        
+        if include_plan:
+            lines.append("\n📚 **План изучения по семестрам:**\n")
+            for semester, courses in plan.items():
+                if courses:
+                    lines.append(f"**Семестр {semester}:**")
+                    for course in courses:
+                        lines.append(f"  • {course.name}")
+                    lines.append("")
+        
+        return "\n".join(lines)
+    
+    async def get_llm_recommendations(
+        self,
+        user_background: str,
+        interests: List[str],
+        available_courses: List[Course]
+    ) -> str:
+        """
+        Получение рекомендаций через LLM для более персонализированного ответа
+        """
+        courses_text = "\n".join([
+            f"- {c.name} (семестр {c.semester}, {c.course_type}): {c.description}"
+            for c in available_courses
+        ])
+        
+        prompt = f"""
+        Пользователь хочет получить рекомендации по выбору курсов.
+        
+        Бэкграунд пользователя: {user_background}
+        Интересы: {', '.join(interests)}
+        
+        Доступные выборные курсы:
+        {courses_text}
+        
+        Дай персонализированные рекомендации:
+        1. Какие 3-5 курсов лучше всего подойдут этому студенту?
+        2. В каком порядке их лучше изучать?
+        3. Какие навыки поможет развить каждый курс?
+        4. Как это поможет в карьере?
+        
+        Учитывай уровень подготовки студента.
+        """
+        
+        # Одинаковые профили и наборы курсов не оплачивают повторный запрос
+        raw_key = f"{settings.LLM_MODEL}|{LLM_RECOMMENDATIONS_TEMPERATURE}|{prompt}"
+        cache_key = "llm_recommendations:" + hashlib.blake2b(raw_key.encode("utf-8")).hexdigest()
+        cached = self.llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        content = await self.llm.submit(
+            messages=[
+                {"role": "system", "content": "Ты — консультант по образовательным программам в области AI."},
+                {"role": "user", "content": prompt}
+            ],
+            model=settings.LLM_MODEL,
+            temperature=LLM_RECOMMENDATIONS_TEMPERATURE,
+            max_tokens=LLM_RECOMMENDATIONS_MAX_TOKENS
+        )
+        
+        if content:
+            self.llm_cache.set(cache_key, content, expire=LLM_RECOMMENDATIONS_TTL_SECONDS)
+        return content
\ No newline at end of file